@@ -1,7 +1,19 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import JSON, Boolean, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -23,6 +35,75 @@ class CodeSystem(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
+class CodeSystemRendition(Base):
+    """Pre-serialized (and pre-compressed) JSON body of one CodeSystem version."""
+
+    __tablename__ = "codesystem_renditions"
+    __table_args__ = (
+        UniqueConstraint(
+            "cs_id", "version", "encoding", name="uq_codesystem_renditions_version"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    cs_id: Mapped[str] = mapped_column(String(128), index=True)
+    version: Mapped[str] = mapped_column(String(64))
+    encoding: Mapped[str] = mapped_column(String(16))  # identity, gzip, br
+    body: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class Concept(Base):
+    __tablename__ = "concepts"
+    __table_args__ = (
+        UniqueConstraint("system", "code", name="uq_concepts_system_code"),
+        # Requires the pg_trgm extension (created by the ingest script)
+        Index(
+            "ix_concepts_normalized_display_trgm",
+            "normalized_display",
+            postgresql_using="gin",
+            postgresql_ops={"normalized_display": "gin_trgm_ops"},
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    system: Mapped[str] = mapped_column(String(512))
+    code: Mapped[str] = mapped_column(String(128))
+    display: Mapped[str] = mapped_column(Text)
+    definition: Mapped[Optional[str]] = mapped_column(Text)
+    normalized_display: Mapped[str] = mapped_column(Text)
+    synonyms: Mapped[Optional[list]] = mapped_column(JSON)
+
+
+class ICD11Entity(Base):
+    __tablename__ = "icd11_entities"
+    __table_args__ = (
+        UniqueConstraint(
+            "release_id",
+            "linearization",
+            "entity_uri",
+            name="uq_icd11_entities_release_lin_uri",
+        ),
+        Index(
+            "ix_icd11_entities_release_lin_code", "release_id", "linearization", "code"
+        ),
+        Index("ix_icd11_entities_release_norm_title", "release_id", "normalized_title"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    release_id: Mapped[str] = mapped_column(String(32))
+    linearization: Mapped[str] = mapped_column(String(32))
+    entity_uri: Mapped[str] = mapped_column(String(512))
+    code: Mapped[Optional[str]] = mapped_column(String(64))
+    title: Mapped[Optional[str]] = mapped_column(Text)
+    # normalize_term(title): exact-title lookups for $translate
+    normalized_title: Mapped[Optional[str]] = mapped_column(Text)
+    class_kind: Mapped[Optional[str]] = mapped_column(String(32))
+    parent_uri: Mapped[Optional[str]] = mapped_column(String(512))
+    parent_code: Mapped[Optional[str]] = mapped_column(String(64))
+    synonyms: Mapped[Optional[list]] = mapped_column(JSON)
+    index_terms: Mapped[Optional[list]] = mapped_column(JSON)
+
+
 class ConceptMap(Base):
     __tablename__ = "conceptmaps"
 
@@ -38,6 +119,7 @@ class ConceptMap(Base):
 
 class Mapping(Base):
     __tablename__ = "mappings"
+    __table_args__ = (Index("ix_mappings_source", "source_system", "source_code"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     source_system: Mapped[str] = mapped_column(String(256), index=True)
@@ -46,6 +128,52 @@ class Mapping(Base):
     target_code: Mapped[str] = mapped_column(String(128), index=True)
     equivalence: Mapped[str] = mapped_column(String(64), default="relatedto")
     display: Mapped[Optional[str]] = mapped_column(String(512))
+    # "curated" rows are hand-maintained; "autocode" rows are precomputed
+    origin: Mapped[str] = mapped_column(String(32), default="curated")
+    match_score: Mapped[Optional[float]] = mapped_column(Float)
+    release_id: Mapped[Optional[str]] = mapped_column(String(32))
+
+
+class AutocodeCheckpoint(Base):
+    """Last autocode run per source concept, so re-runs skip unchanged ones."""
+
+    __tablename__ = "autocode_checkpoints"
+    __table_args__ = (
+        UniqueConstraint(
+            "source_system", "source_code", name="uq_autocode_checkpoints_source"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source_system: Mapped[str] = mapped_column(String(512))
+    source_code: Mapped[str] = mapped_column(String(128))
+    display_hash: Mapped[str] = mapped_column(String(64))
+    release_id: Mapped[str] = mapped_column(String(32))
+    matched: Mapped[bool] = mapped_column(Boolean, default=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class IngestSource(Base):
+    """Content hash of each ingested file, so re-runs skip unchanged ones."""
+
+    __tablename__ = "ingest_sources"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(256), unique=True)
+    sha256: Mapped[str] = mapped_column(String(64))
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SynonymSet(Base):
+    """Synonym groups compiled at ingest time, stored as one compact row."""
+
+    __tablename__ = "synonym_sets"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(64), unique=True)
+    digest: Mapped[str] = mapped_column(String(64))
+    groups: Mapped[list] = mapped_column(JSON)  # [[normalized term, ...], ...]
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 class AuditLog(Base):
@@ -1,10 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from ..config import get_settings
+from ..metrics import instrument_engine
 
 
 settings = get_settings()
 engine = create_async_engine(settings.database_url, echo=False, pool_pre_ping=True)
+if settings.metrics_enabled:
+    instrument_engine(engine)
 AsyncSessionLocal = async_sessionmaker(
     engine, expire_on_commit=False, class_=AsyncSession
 )
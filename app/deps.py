@@ -1,6 +1,27 @@
 from typing import Any
 
+from fastapi import Request
 
-async def audit_log(action: str, resource: str, details: dict[str, Any] | None = None):
-    # TODO: implement DB persistence
-    return None
+from .services.audit import audit_writer
+
+
+async def audit_log(
+    action: str,
+    resource: str,
+    details: dict[str, Any] | None = None,
+    request: Request | None = None,
+    status_code: int = 200,
+):
+    """Queue an application-level audit event; never waits on the DB."""
+    await audit_writer.record(
+        {
+            "request_id": getattr(request.state, "request_id", "") if request else "",
+            "user_sub": None,
+            "action": action,
+            "resource": resource,
+            "path": request.url.path if request else "",
+            "method": request.method if request else "",
+            "status_code": status_code,
+            "details": details,
+        }
+    )
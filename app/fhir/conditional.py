@@ -0,0 +1,40 @@
+from hashlib import sha256
+
+import orjson
+from fastapi import Request, Response
+
+from ..config import get_settings
+
+
+def make_etag(*parts, weak: bool = False) -> str:
+    """Quoted entity tag over ``parts`` (which must be JSON-serializable)."""
+    tag = f'"{sha256(orjson.dumps(parts)).hexdigest()[:32]}"'
+    return f"W/{tag}" if weak else tag
+
+
+def _matches(header: str | None, etag: str) -> bool:
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2)
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == target for t in header.split(","))
+
+
+def conditional(
+    request: Request | None, response: Response | None, etag: str
+) -> Response | None:
+    """Attach validators to ``response``; return a 304 if the client is current.
+
+    Handlers call this before building the body and return the 304 as-is
+    when one comes back. Direct (Bundle) calls pass no request/response and
+    always get ``None``.
+    """
+    if request is None or response is None:
+        return None
+    headers = {"ETag": etag, "Cache-Control": get_settings().fhir_cache_control}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,25 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+import asyncio
+from http import HTTPStatus
+from typing import Iterable
+from urllib.parse import parse_qsl
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fhir.resources.parameters import Parameters
 from fhir.resources.valueset import ValueSet
 from fhir.resources.bundle import Bundle
 from fhir.resources.codesystem import CodeSystem
 
-from sqlalchemy import select
+from sqlalchemy import func, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db.session import get_db
-from ..db.models import CodeSystem as CSModel, Mapping as MappingModel
+from ..db.session import AsyncSessionLocal, get_db
+from ..db.models import (
+    CodeSystem as CSModel,
+    Concept as ConceptModel,
+    Mapping as MappingModel,
+)
 from ..security import get_current_user
-from ..services.search import autocomplete as es_autocomplete
+from .conditional import conditional, make_etag
+from ..services.search import autocomplete_async as es_autocomplete
+from ..services.autocomplete import AutocompleteEngine
+from ..services.concept_index import concept_index
+from ..services.icd11_mirror import mirror_lookup, mirror_title_matches
+from ..services.ingest import normalize_term
+from ..services.renditions import codesystem_bodies, codesystem_content, pick_encoding
+from ..services.synonyms import synonym_dictionary
 from ..services.icd11 import (
+    ICD11_MMS,
+    ICD11_TM2,
+    autocode_best_effort,
     fetch_icd11_concept,
     search_icd11,
-    autocode_icd11,
 )
 from ..config import get_settings
+from ..metrics import EXPAND_SOURCE
 
 
 router = APIRouter(prefix="/fhir", tags=["FHIR"])
+memory_search = AutocompleteEngine()
+
+
+def _expand_system(url: str) -> str | None:
+    """CodeSystem to restrict an expansion to, derived from the ValueSet url.
+
+    Accepts a CodeSystem url, its implicit ``?vs`` ValueSet, or a
+    ``.../ValueSet/<name>`` sibling of ``.../CodeSystem/<name>``; umbrella
+    ValueSets (e.g. ``.../ValueSet/ayush``) search every system.
+    """
+    candidate = url.removesuffix("?vs").replace("/ValueSet/", "/CodeSystem/")
+    return candidate if concept_index.get(candidate) else None
+
+
+async def _memory_autocomplete(
+    db: AsyncSession,
+    term: str,
+    size: int,
+    system: str | None = None,
+    alternatives: Iterable[str] = (),
+) -> list[dict]:
+    await concept_index.refresh(db)
+    if memory_search.generation != concept_index.generation:
+        memory_search.build(
+            (
+                {"system": cs.url, **c}
+                for cs in concept_index.systems()
+                for c in cs.concepts.values()
+            ),
+            generation=concept_index.generation,
+        )
+    hits: dict[tuple, dict] = {}
+    for t in [term, *alternatives]:
+        for h in memory_search.search(t, size=size, system=system):
+            hits.setdefault((h["system"], h["code"]), h)
+        if len(hits) >= size:
+            break
+    return list(hits.values())[:size]
+
+
+def _icd_answer(
+    request, response, op: str, system: str, code: str, source, out, *extra
+):
+    """Return ``out`` (or a 304) with validators over the answer and its source.
+
+    Only for settled answers; upstream-error paths return without calling this
+    so no ETag or Cache-Control is sent.
+    """
+    etag = make_etag(
+        op, system, code, *extra, get_settings().who_release_id, source, out
+    )
+    if not_modified := conditional(request, response, etag):
+        return not_modified
+    return out
 
 
 @router.get("/CodeSystem/$lookup", response_model=dict)
@@ -28,14 +101,36 @@ async def codesystem_lookup(
     code: str = Query(..., description="Code to lookup"),
     user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    request: Request = None,
+    response: Response = None,
 ):
     if system.startswith("http://id.who.int/icd/release/11/"):
         linearization = "mms"
         if system.endswith("/tm2") or "/tm2" in system:
             linearization = "tm2"
+        entity = await mirror_lookup(db, code, linearization)
+        if entity:
+            out = Parameters.construct(
+                parameter=[
+                    {"name": "name", "valueString": system},
+                    {
+                        "name": "version",
+                        "valueString": system.split("/release/11/")[-1],
+                    },
+                    {"name": "display", "valueString": entity.title or code},
+                ]
+            ).dict(exclude_none=True)
+            return _icd_answer(request, response, "lookup", system, code, "mirror", out)
+        if get_settings().icd11_mirror_only:
+            raise HTTPException(status_code=404, detail="Code not found in ICD-11")
         from ..services.icd11 import codeinfo_icd11
 
-        info = codeinfo_icd11(code, linearization=linearization)
+        try:
+            info = await codeinfo_icd11(code, linearization=linearization)
+        except Exception:
+            raise HTTPException(
+                status_code=503, detail="ICD-11 service unavailable"
+            ) from None
         if info and (info.get("code") or info.get("simplifiedCode")):
             title = (
                 (info.get("title") or {}).get("@value")
@@ -43,11 +138,16 @@ async def codesystem_lookup(
                 else info.get("title")
             )
             display = title
+            # A display recovered from a failed search must not be cached
+            degraded = False
             if not display:
                 try:
-                    results = search_icd11(code, linearization=linearization, size=1)
+                    results = await search_icd11(
+                        code, linearization=linearization, size=1
+                    )
                 except Exception:
                     results = []
+                    degraded = True
                 if results:
                     first = results[0]
                     display = (
@@ -66,25 +166,30 @@ async def codesystem_lookup(
                     },
                     {"name": "display", "valueString": display},
                 ]
-            )
-            return out.dict(exclude_none=True)
+            ).dict(exclude_none=True)
+            if degraded:
+                return out
+            return _icd_answer(request, response, "lookup", system, code, "who", out)
         raise HTTPException(status_code=404, detail="Code not found in ICD-11")
 
-    res = await db.execute(select(CSModel).where(CSModel.url == system))
-    cs = res.scalar_one_or_none()
+    await concept_index.refresh(db)
+    cs = concept_index.get(system)
     if not cs:
         raise HTTPException(status_code=404, detail="CodeSystem not found")
-    for c in (cs.content or {}).get("concept", []):
-        if c.get("code") == code:
-            display = c.get("display") or code
-            out = Parameters.construct(
-                parameter=[
-                    {"name": "name", "valueString": cs.content.get("url")},
-                    {"name": "version", "valueString": cs.content.get("version")},
-                    {"name": "display", "valueString": display},
-                ]
-            )
-            return out.dict(exclude_none=True)
+    c = cs.concepts.get(code)
+    if c:
+        etag = make_etag("lookup", cs.url, cs.version, code)
+        if not_modified := conditional(request, response, etag):
+            return not_modified
+        display = c.get("display") or code
+        out = Parameters.construct(
+            parameter=[
+                {"name": "name", "valueString": cs.url},
+                {"name": "version", "valueString": cs.version},
+                {"name": "display", "valueString": display},
+            ]
+        )
+        return out.dict(exclude_none=True)
     raise HTTPException(status_code=404, detail="Code not found")
 
 
@@ -95,15 +200,50 @@ async def validate_code(
     display: str | None = Query(None),
     user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    request: Request = None,
+    response: Response = None,
 ):
     if system.startswith("http://id.who.int/icd/release/11/"):
         # Prefer codeinfo for exact code lookup
         linearization = "mms"
         if system.endswith("/tm2") or "/tm2" in system:
             linearization = "tm2"
-        from ..services.icd11 import codeinfo_icd11
+        entity = await mirror_lookup(db, code, linearization)
+        if entity:
+            out = Parameters.construct(
+                parameter=[
+                    {"name": "result", "valueBoolean": True},
+                    {"name": "system", "valueUri": system},
+                    {"name": "code", "valueCode": code},
+                    *(
+                        [{"name": "display", "valueString": entity.title}]
+                        if entity.title
+                        else []
+                    ),
+                ]
+            ).dict(exclude_none=True)
+            return _icd_answer(
+                request, response, "validate-code", system, code, "mirror", out, display
+            )
+        info = None
+        source = "mirror"
+        if not get_settings().icd11_mirror_only:
+            from ..services.icd11 import codeinfo_icd11
 
-        info = codeinfo_icd11(code, linearization=linearization)
+            source = "who"
+            try:
+                info = await codeinfo_icd11(code, linearization=linearization)
+            except Exception:
+                # Transient: answered without validators so nobody caches it
+                return Parameters.construct(
+                    parameter=[
+                        {"name": "result", "valueBoolean": False},
+                        {
+                            "name": "message",
+                            "valueString": "ICD-11 service unavailable",
+                        },
+                    ]
+                ).dict(exclude_none=True)
         if info and (info.get("code") or info.get("simplifiedCode")):
             title = (
                 (info.get("title") or {}).get("@value")
@@ -117,19 +257,25 @@ async def validate_code(
                     {"name": "code", "valueCode": code},
                     *([{"name": "display", "valueString": title}] if title else []),
                 ]
-            )
-            return out.dict(exclude_none=True)
-        out = Parameters.construct(
-            parameter=[
-                {"name": "result", "valueBoolean": False},
-                {"name": "message", "valueString": "Code not found in ICD-11"},
-            ]
+            ).dict(exclude_none=True)
+        else:
+            out = Parameters.construct(
+                parameter=[
+                    {"name": "result", "valueBoolean": False},
+                    {"name": "message", "valueString": "Code not found in ICD-11"},
+                ]
+            ).dict(exclude_none=True)
+        return _icd_answer(
+            request, response, "validate-code", system, code, source, out, display
         )
-        return out.dict(exclude_none=True)
 
     # Local CodeSystem validation
-    res = await db.execute(select(CSModel).where(CSModel.url == system))
-    cs = res.scalar_one_or_none()
+    await concept_index.refresh(db)
+    cs = concept_index.get(system)
+    if cs:
+        etag = make_etag("validate-code", cs.url, cs.version, code, display)
+        if not_modified := conditional(request, response, etag):
+            return not_modified
     if not cs:
         out = Parameters.construct(
             parameter=[
@@ -138,17 +284,17 @@ async def validate_code(
             ]
         )
         return out.dict(exclude_none=True)
-    for c in (cs.content or {}).get("concept", []):
-        if c.get("code") == code:
-            out = Parameters.construct(
-                parameter=[
-                    {"name": "result", "valueBoolean": True},
-                    {"name": "system", "valueUri": system},
-                    {"name": "code", "valueCode": code},
-                    {"name": "display", "valueString": c.get("display") or code},
-                ]
-            )
-            return out.dict(exclude_none=True)
+    c = cs.concepts.get(code)
+    if c:
+        out = Parameters.construct(
+            parameter=[
+                {"name": "result", "valueBoolean": True},
+                {"name": "system", "valueUri": system},
+                {"name": "code", "valueCode": code},
+                {"name": "display", "valueString": c.get("display") or code},
+            ]
+        )
+        return out.dict(exclude_none=True)
     out = Parameters.construct(
         parameter=[
             {"name": "result", "valueBoolean": False},
@@ -158,15 +304,94 @@ async def validate_code(
     return out.dict(exclude_none=True)
 
 
+SUBSETTED = {
+    "system": "http://terminology.hl7.org/CodeSystem/v3-ObservationValue",
+    "code": "SUBSETTED",
+}
+
+
+def _subset_codesystem(
+    content: dict,
+    summary: bool,
+    elements: str | None,
+    count: int | None,
+    offset: int,
+) -> dict:
+    concepts = content.get("concept") or []
+    out = dict(content)
+    if summary:
+        out.pop("concept", None)
+    elif elements:
+        keep = {"resourceType", "id", "meta", *(e.strip() for e in elements.split(","))}
+        out = {k: v for k, v in out.items() if k in keep}
+    if "concept" in out:
+        end = None if count is None else offset + count
+        out["concept"] = concepts[offset:end]
+    if summary or count is not None or offset:
+        out.setdefault("count", len(concepts))
+    meta = dict(out.get("meta") or {})
+    meta["tag"] = [*(meta.get("tag") or []), SUBSETTED]
+    out["meta"] = meta
+    return out
+
+
 @router.get("/CodeSystem/{cs_id}", response_model=dict)
 async def get_codesystem(
-    cs_id: str, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)
+    cs_id: str,
+    summary: str | None = Query(None, alias="_summary"),
+    elements: str | None = Query(None, alias="_elements"),
+    count: int | None = Query(None, alias="_count", ge=0),
+    offset: int = Query(0, alias="_offset", ge=0),
+    user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    request: Request = None,
+    response: Response = None,
 ):
-    res = await db.execute(select(CSModel).where(CSModel.cs_id == cs_id))
-    row = res.scalar_one_or_none()
+    if summary not in (None, "true", "false"):
+        raise HTTPException(status_code=400, detail="Unsupported _summary value")
+    # Validators come from the cheap (id, version) columns, so a 304 never
+    # loads or serializes the content
+    res = await db.execute(
+        select(CSModel.id, CSModel.version).where(CSModel.cs_id == cs_id)
+    )
+    row = res.one_or_none()
     if not row:
         raise HTTPException(status_code=404, detail="CodeSystem not found")
-    return row.content
+
+    if summary == "true" or elements or count is not None or offset:
+        etag = make_etag(
+            "CodeSystem", cs_id, row.id, row.version, summary, elements, count, offset
+        )
+        if not_modified := conditional(request, response, etag):
+            return not_modified
+        content = await codesystem_content(db, row.id, row.version)
+        total = len(content.get("concept") or [])
+        if response is not None and count and offset + count < total:
+            next_url = request.url.include_query_params(_offset=offset + count)
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return _subset_codesystem(content, summary == "true", elements, count, offset)
+
+    if request is None:
+        # Direct (Bundle) call: the caller wants the resource, not bytes
+        return await codesystem_content(db, row.id, row.version)
+    # Whole resource: stream the pre-rendered bytes in the best accepted
+    # encoding instead of decoding and re-encoding the JSON
+    bodies = await codesystem_bodies(db, row.id, cs_id, row.version)
+    encoding = pick_encoding(request.headers.get("accept-encoding"), bodies)
+    etag = make_etag("CodeSystem", cs_id, row.id, row.version, encoding)
+    if not_modified := conditional(request, response, etag):
+        not_modified.headers["Vary"] = "Accept-Encoding"
+        return not_modified
+    headers = {
+        "ETag": etag,
+        "Cache-Control": get_settings().fhir_cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=bodies[encoding], media_type="application/json", headers=headers
+    )
 
 
 @router.get("/ValueSet/$expand", response_model=dict)
@@ -177,14 +402,44 @@ async def valueset_expand(
     count: int = Query(10),
     user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
+    response: Response = None,
 ):
+    await concept_index.refresh(db)
+    await synonym_dictionary.refresh(db)
+    # Weak: the result set is stable but identifier/timestamp are per request
+    etag = make_etag(
+        "expand",
+        url,
+        filter,
+        count,
+        sorted((cs.url, cs.version) for cs in concept_index.systems()),
+        synonym_dictionary.digest,
+        weak=True,
+    )
+    if not_modified := conditional(request, response, etag):
+        return not_modified
     vs = ValueSet.construct(id="expand-result", url=url, status="active")
     contains = []
     if filter:
-        # Try Elasticsearch first
+        system = _expand_system(url)
+        settings = get_settings()
+        alternatives = synonym_dictionary.expand(
+            filter, limit=settings.synonym_expansion_limit
+        )
+        # Try the configured search backend (Elasticsearch by default) first
         try:
-            settings = get_settings()
-            hits = es_autocomplete(settings.search_index_name, filter, size=count)
+            if settings.search_backend == "memory":
+                hits = await _memory_autocomplete(
+                    db, filter, count, system, alternatives
+                )
+            else:
+                hits = await es_autocomplete(
+                    settings.search_index_name,
+                    filter,
+                    size=count,
+                    system=system,
+                    alternatives=alternatives,
+                )
             for h in hits:
                 contains.append(
                     {
@@ -195,24 +450,35 @@ async def valueset_expand(
                 )
         except Exception:
             hits = []
-        # Fallback to DB LIKE search if ES empty
-        if not contains:
-            res = await db.execute(select(CSModel))
-            for cs in res.scalars():
-                for c in (cs.content or {}).get("concept", []):
-                    disp = c.get("display", "")
-                    if filter.lower() in disp.lower():
-                        contains.append(
-                            {
-                                "system": cs.content.get("url"),
-                                "code": c.get("code"),
-                                "display": disp,
-                            }
-                        )
-                        if len(contains) >= count:
-                            break
-                if len(contains) >= count:
-                    break
+        # Fallback to DB LIKE search (pg_trgm GIN index) if search is empty
+        norm = normalize_term(filter)
+        if contains:
+            EXPAND_SOURCE.labels(settings.search_backend).inc()
+        elif norm:
+            EXPAND_SOURCE.labels("db").inc()
+        if not contains and norm:
+            stmt = select(
+                ConceptModel.system, ConceptModel.code, ConceptModel.display
+            ).where(
+                or_(
+                    *(
+                        ConceptModel.normalized_display.contains(t, autoescape=True)
+                        for t in [norm, *alternatives]
+                    )
+                )
+            )
+            if system:
+                stmt = stmt.where(ConceptModel.system == system)
+            res = await db.execute(
+                stmt.order_by(
+                    ConceptModel.normalized_display.startswith(
+                        norm, autoescape=True
+                    ).desc(),
+                    func.length(ConceptModel.normalized_display),
+                ).limit(count)
+            )
+            for cs_url, code, disp in res.all():
+                contains.append({"system": cs_url, "code": code, "display": disp})
     from datetime import datetime, timezone
 
     vs.expansion = {
@@ -224,127 +490,82 @@ async def valueset_expand(
     return vs.dict(exclude_none=True)
 
 
-@router.post("/ConceptMap/$translate", response_model=dict)
-async def conceptmap_translate(
-    params: dict, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)
-):
-    try:
-        parameters = Parameters(**params)
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+def is_icd11(sys: str | None) -> bool:
+    return bool(sys and sys.startswith("http://id.who.int/icd/release/11/"))
 
-    def _extract_param(name: str) -> str | None:
-        for p in parameters.parameter or []:
-            if p.name != name:
-                continue
-            for attr in ("valueUri", "valueCode", "valueString", "valueBoolean"):
-                v = getattr(p, attr, None)
-                if v is not None:
-                    return str(v)
-        return None
 
-    url = _extract_param("url")
-    code = _extract_param("code")
-    system = _extract_param("system")
-    if not (url and code and system):
-        raise HTTPException(
-            status_code=400, detail="Missing url, code, or system parameter"
-        )
-    res = await db.execute(
-        select(MappingModel).where(
-            MappingModel.source_system == system,
-            MappingModel.source_code == code,
-        )
-    )
-    mappings = list(res.scalars())
-    if not mappings:
-        # Try ICD-API autocode (TM2 first, then MMS) using the source display
-        src_display = None
-        res_cs = await db.execute(select(CSModel))
-        for cs in res_cs.scalars():
-            if cs.content and cs.content.get("url") == system:
-                for c in (cs.content or {}).get("concept", []):
-                    if c.get("code") == code:
-                        src_display = c.get("display")
-                        break
-        best_effort = None
-        search_system = None
-        if src_display:
-            try:
-                ac = autocode_icd11(src_display, linearization="tm2")
-                if not ac or not ac.get("theCode"):
-                    ac = autocode_icd11(src_display, linearization="mms")
-                    if ac and ac.get("theCode"):
-                        search_system = "http://id.who.int/icd/release/11/mms"
-                else:
-                    search_system = "http://id.who.int/icd/release/11/tm2"
-                if ac and ac.get("theCode"):
-                    best_effort = ac
-            except Exception:
-                best_effort = None
-        if best_effort:
-            out = Parameters.construct(
-                parameter=[
-                    {"name": "result", "valueBoolean": True},
-                    {
-                        "name": "match",
-                        "part": [
-                            {"name": "equivalence", "valueCode": "relatedto"},
-                            {
-                                "name": "concept",
-                                "valueCoding": {
-                                    "system": search_system
-                                    or "http://id.who.int/icd/release/11/mms",
-                                    "code": best_effort.get("theCode")
-                                    or best_effort.get("code")
-                                    or best_effort.get("id")
-                                    or "",
-                                    "display": (
-                                        best_effort.get("matchingText")
-                                        or best_effort.get("label")
-                                        or best_effort.get("title")
-                                        or (best_effort.get("title", {}) or {}).get(
-                                            "@value"
-                                        )
-                                        or best_effort.get("theCode")
-                                    ),
-                                },
-                            },
-                            *(
-                                [
-                                    {
-                                        "name": "score",
-                                        "valueDecimal": float(
-                                            best_effort.get("matchScore")
-                                        ),
-                                    }
-                                ]
-                                if isinstance(
-                                    best_effort.get("matchScore"), (int, float, str)
-                                )
-                                and str(best_effort.get("matchScore"))
-                                .replace(".", "", 1)
-                                .isdigit()
-                                else []
-                            ),
-                        ],
+def _best_effort_params(best_effort: dict, search_system: str | None) -> list[dict]:
+    return [
+        {"name": "result", "valueBoolean": True},
+        {
+            "name": "match",
+            "part": [
+                {"name": "equivalence", "valueCode": "relatedto"},
+                {
+                    "name": "concept",
+                    "valueCoding": {
+                        "system": search_system or ICD11_MMS,
+                        "code": best_effort.get("theCode")
+                        or best_effort.get("code")
+                        or best_effort.get("id")
+                        or "",
+                        "display": (
+                            best_effort.get("matchingText")
+                            or best_effort.get("label")
+                            or best_effort.get("title")
+                            or (best_effort.get("title", {}) or {}).get("@value")
+                            or best_effort.get("theCode")
+                        ),
                     },
-                    {
-                        "name": "message",
-                        "valueString": "Returned ICD-11 best-effort match via WHO ICD-API autocode.",
+                },
+                *(
+                    [
+                        {
+                            "name": "score",
+                            "valueDecimal": float(best_effort.get("matchScore")),
+                        }
+                    ]
+                    if isinstance(best_effort.get("matchScore"), (int, float, str))
+                    and str(best_effort.get("matchScore")).replace(".", "", 1).isdigit()
+                    else []
+                ),
+            ],
+        },
+        {
+            "name": "message",
+            "valueString": "Returned ICD-11 best-effort match via WHO ICD-API autocode.",
+        },
+    ]
+
+
+def _mirror_match_params(entity, term: str) -> list[dict]:
+    return [
+        {"name": "result", "valueBoolean": True},
+        {
+            "name": "match",
+            "part": [
+                {"name": "equivalence", "valueCode": "relatedto"},
+                {
+                    "name": "concept",
+                    "valueCoding": {
+                        "system": (
+                            ICD11_TM2 if entity.linearization == "tm2" else ICD11_MMS
+                        ),
+                        "code": entity.code,
+                        "display": entity.title or entity.code,
                     },
-                ]
-            )
-            return out.dict(exclude_none=True)
-        out = Parameters.construct(
-            parameter=[{"name": "result", "valueBoolean": False}]
-        )
-        return out.dict(exclude_none=True)
+                },
+            ],
+        },
+        {
+            "name": "message",
+            "valueString": f"Returned ICD-11 match for '{term}' from the local mirror.",
+        },
+    ]
 
-    # Prefer ICD-11 targets if present; otherwise include ICD-10
-    def is_icd11(sys: str | None) -> bool:
-        return bool(sys and sys.startswith("http://id.who.int/icd/release/11/"))
 
+def _mapping_params(mappings: list[MappingModel]) -> list[dict]:
+    # Prefer ICD-11 targets if present; otherwise include ICD-10
     ordered = sorted(mappings, key=lambda m: 0 if is_icd11(m.target_system) else 1)
     parts = []
     for m in ordered:
@@ -361,6 +582,11 @@ async def conceptmap_translate(
                             "display": m.display or m.target_code,
                         },
                     },
+                    *(
+                        [{"name": "score", "valueDecimal": m.match_score}]
+                        if m.match_score is not None
+                        else []
+                    ),
                 ],
             }
         )
@@ -376,17 +602,274 @@ async def conceptmap_translate(
                 "valueString": "ICD-11 mapping not found; returning ICD-10 related mapping.",
             }
         )
+    return parameters
+
+
+async def translate_codes(
+    db: AsyncSession, pairs: list[tuple[str, str]]
+) -> list[list[dict]]:
+    """Translate (system, code) pairs; returns the parameters for each pair."""
+    keys = list(dict.fromkeys(pairs))
+    res = await db.execute(
+        select(MappingModel).where(
+            tuple_(MappingModel.source_system, MappingModel.source_code).in_(keys),
+            # Precomputed autocode rows only count for the configured release
+            or_(
+                MappingModel.release_id.is_(None),
+                MappingModel.release_id == get_settings().who_release_id,
+            ),
+        )
+    )
+    mappings: dict[tuple[str, str], list[MappingModel]] = {}
+    for m in res.scalars():
+        mappings.setdefault((m.source_system, m.source_code), []).append(m)
+
+    unmapped = [k for k in keys if k not in mappings]
+    displays: dict[tuple[str, str], str] = {}
+    if unmapped:
+        res_display = await db.execute(
+            select(ConceptModel.system, ConceptModel.code, ConceptModel.display).where(
+                tuple_(ConceptModel.system, ConceptModel.code).in_(unmapped)
+            )
+        )
+        displays = {(sys, code): disp for sys, code, disp in res_display.all()}
+
+    # The display and its known synonyms are tried against the local ICD-11
+    # mirror first; only codes with no local title match go to WHO autocode
+    settings = get_settings()
+    if displays:
+        await synonym_dictionary.refresh(db)
+    candidates = {
+        key: [
+            normalize_term(disp),
+            *synonym_dictionary.expand(disp, limit=settings.synonym_expansion_limit),
+        ]
+        for key, disp in displays.items()
+        if disp
+    }
+    local = await mirror_title_matches(
+        db, (t for terms in candidates.values() for t in terms)
+    )
+    sem = asyncio.Semaphore(settings.translate_concurrency)
+
+    async def best_effort(key: tuple[str, str]) -> list[dict]:
+        for term in candidates.get(key, []):
+            if term in local:
+                return _mirror_match_params(local[term], term)
+        src_display = displays.get(key)
+        if src_display:
+            async with sem:
+                ac, search_system = await autocode_best_effort(src_display)
+            if ac:
+                return _best_effort_params(ac, search_system)
+        return [{"name": "result", "valueBoolean": False}]
+
+    fallbacks = await asyncio.gather(*(best_effort(k) for k in unmapped))
+    results = dict(zip(unmapped, fallbacks))
+    for key, ms in mappings.items():
+        results[key] = _mapping_params(ms)
+    return [results[p] for p in pairs]
 
-    out = Parameters.construct(parameter=parameters)
+
+@router.post("/ConceptMap/$translate", response_model=dict)
+async def conceptmap_translate(
+    params: dict, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)
+):
+    try:
+        parameters = Parameters(**params)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def _extract_params(name: str) -> list[str]:
+        values = []
+        for p in parameters.parameter or []:
+            if p.name != name:
+                continue
+            for attr in ("valueUri", "valueCode", "valueString", "valueBoolean"):
+                v = getattr(p, attr, None)
+                if v is not None:
+                    values.append(str(v))
+                    break
+        return values
+
+    url = next(iter(_extract_params("url")), None)
+    system = next(iter(_extract_params("system")), None)
+    # Batch form: repeated `code` (sharing `system`) and/or `coding` parameters
+    codes = _extract_params("code")
+    pairs = [(system, code) for code in codes if system]
+    batch = len(codes) > 1
+    for p in parameters.parameter or []:
+        if p.name != "coding":
+            continue
+        batch = True
+        coding = getattr(p, "valueCoding", None)
+        if coding is not None and coding.system and coding.code:
+            pairs.append((str(coding.system), str(coding.code)))
+    if not (url and pairs):
+        raise HTTPException(
+            status_code=400, detail="Missing url, code, or system parameter"
+        )
+    max_codes = get_settings().translate_batch_max_codes
+    if len(pairs) > max_codes:
+        raise HTTPException(
+            status_code=400, detail=f"At most {max_codes} codes per $translate"
+        )
+
+    results = await translate_codes(db, pairs)
+    # The batch form always answers with `translation` groups, even for one
+    if not batch:
+        out = Parameters.construct(parameter=results[0])
+        return out.dict(exclude_none=True)
+    out = Parameters.construct(
+        parameter=[
+            {
+                "name": "translation",
+                "part": [
+                    {"name": "system", "valueUri": system},
+                    {"name": "code", "valueCode": code},
+                    *result,
+                ],
+            }
+            for (system, code), result in zip(pairs, results)
+        ]
+    )
     return out.dict(exclude_none=True)
 
 
+def _operation_outcome(detail: str) -> dict:
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": "error", "code": "processing", "diagnostics": detail}],
+    }
+
+
+def _status_line(code: int) -> str:
+    return f"{code} {HTTPStatus(code).phrase}"
+
+
+async def _dispatch_entry(
+    method: str, url: str, resource: dict | None, request: Request, user, db
+) -> dict:
+    path, _, query = url.partition("?")
+    path = path.strip("/")
+    if path.startswith("fhir/"):
+        path = path[len("fhir/") :]
+    q = dict(parse_qsl(query))
+
+    def arg(name: str) -> str:
+        if name not in q:
+            raise HTTPException(status_code=400, detail=f"Missing {name} parameter")
+        return q[name]
+
+    if method == "GET" and path == "CodeSystem/$lookup":
+        return await codesystem_lookup(
+            system=arg("system"), code=arg("code"), user=user, db=db
+        )
+    if method == "GET" and path == "CodeSystem/$validate-code":
+        return await validate_code(
+            system=arg("system"),
+            code=arg("code"),
+            display=q.get("display"),
+            user=user,
+            db=db,
+        )
+    if method == "GET" and path == "ValueSet/$expand":
+        try:
+            count = int(q.get("count", 10))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid count parameter")
+        return await valueset_expand(
+            request,
+            url=arg("url"),
+            filter=q.get("filter"),
+            count=count,
+            user=user,
+            db=db,
+        )
+    if method == "POST" and path == "ConceptMap/$translate":
+        if not resource:
+            raise HTTPException(status_code=400, detail="Missing Parameters resource")
+        return await conceptmap_translate(resource, user=user, db=db)
+    if method == "GET" and path.startswith("CodeSystem/") and path.count("/") == 1:
+        try:
+            page = {
+                "count": int(q["_count"]) if "_count" in q else None,
+                "offset": int(q.get("_offset", 0)),
+            }
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid paging parameter")
+        return await get_codesystem(
+            path.split("/", 1)[1],
+            summary=q.get("_summary"),
+            elements=q.get("_elements"),
+            **page,
+            user=user,
+            db=db,
+        )
+    raise HTTPException(
+        status_code=400, detail=f"Unsupported Bundle entry request: {method} {url}"
+    )
+
+
+async def process_bundle_entries(
+    entries: list[dict], request: Request, user
+) -> list[dict]:
+    """Run batch entries concurrently, each on its own pooled DB session."""
+    sem = asyncio.Semaphore(get_settings().bundle_concurrency)
+
+    async def run(entry: dict) -> dict:
+        req = entry.get("request") or {}
+        async with sem, AsyncSessionLocal() as db:
+            try:
+                body = await _dispatch_entry(
+                    str(req.get("method") or "").upper(),
+                    str(req.get("url") or ""),
+                    entry.get("resource"),
+                    request,
+                    user,
+                    db,
+                )
+            except HTTPException as e:
+                return {
+                    "resource": _operation_outcome(str(e.detail)),
+                    "response": {"status": _status_line(e.status_code)},
+                }
+            except Exception as e:
+                return {
+                    "resource": _operation_outcome(str(e)),
+                    "response": {"status": _status_line(500)},
+                }
+        return {"resource": body, "response": {"status": _status_line(200)}}
+
+    return await asyncio.gather(*(run(e) for e in entries))
+
+
 @router.post("/Bundle", response_model=dict)
-async def post_bundle(
-    bundle: dict, user=Depends(get_current_user), db: AsyncSession = Depends(get_db)
-):
+async def post_bundle(request: Request, bundle: dict, user=Depends(get_current_user)):
     try:
         b = Bundle(**bundle)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return {"resourceType": "Bundle", "type": b.type, "total": len(b.entry or [])}
+    if b.type not in ("batch", "transaction"):
+        return {"resourceType": "Bundle", "type": b.type, "total": len(b.entry or [])}
+
+    entries = bundle.get("entry") or []
+    max_entries = get_settings().bundle_max_entries
+    if len(entries) > max_entries:
+        raise HTTPException(
+            status_code=400, detail=f"At most {max_entries} entries per Bundle"
+        )
+    results = await process_bundle_entries(entries, request, user)
+    if b.type == "transaction":
+        # All-or-nothing: the operations are read-only, so just report failure
+        for res in results:
+            if not res["response"]["status"].startswith("200"):
+                raise HTTPException(
+                    status_code=int(res["response"]["status"].split()[0]),
+                    detail=res["resource"]["issue"][0]["diagnostics"],
+                )
+    return {
+        "resourceType": "Bundle",
+        "type": f"{b.type}-response",
+        "entry": results,
+    }
@@ -1,32 +1,57 @@
+from contextlib import asynccontextmanager
 from datetime import timedelta
 
 import orjson
 from fastapi import Depends, FastAPI
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
 
+from . import metrics
 from .config import get_settings
 from .middleware import (
     AuditMiddleware,
+    MetricsMiddleware,
     RateLimitMiddleware,
     RequestContextMiddleware,
     cors_options,
 )
 from starlette.middleware.cors import CORSMiddleware
-from .security import create_access_token, get_current_user
+from .security import create_access_token, get_current_user, token_cache
 from .fhir.endpoints import router as fhir_router
+from .services.audit import audit_writer
+from .services.icd11 import cache_stats as icd_cache_stats, icd_client
+from .services.jwks import jwks
+from .services.search import close_async_client as close_search_client
 
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit_writer.start()
+    if jwks is not None:
+        await jwks.start()
+    yield
+    if jwks is not None:
+        await jwks.stop()
+    await audit_writer.stop()
+    await icd_client.aclose()
+    await close_search_client()
+
+
 app = FastAPI(
-    title="NAMASTE FHIR Terminology Service", default_response_class=ORJSONResponse
+    title="NAMASTE FHIR Terminology Service",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
-app.add_middleware(RequestContextMiddleware)
 app.add_middleware(RateLimitMiddleware)
+# Inside RequestContextMiddleware (request id), outside the limiter (429s)
 app.add_middleware(AuditMiddleware)
+if get_settings().metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware)
 app.add_middleware(CORSMiddleware, **cors_options())
 
 app.include_router(fhir_router)
@@ -37,6 +62,27 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/healthz/cache")
+async def healthz_cache():
+    return {
+        "icd11": icd_cache_stats(),
+        "auth_tokens": {**token_cache.stats.as_dict(), "size": len(token_cache)},
+    }
+
+
+@app.get("/healthz/audit")
+async def healthz_audit():
+    return audit_writer.stats()
+
+
+if get_settings().metrics_enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        body, content_type = metrics.render()
+        return Response(body, media_type=content_type)
+
+
 @app.post("/auth/token")
 async def auth_token(form_data: OAuth2PasswordRequestForm = Depends()):
     sub = form_data.username or "anonymous"
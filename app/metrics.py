@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram
+from prometheus_client import generate_latest
+from prometheus_client.core import CounterMetricFamily
+from sqlalchemy import event
+
+
+OPERATION_LATENCY = Histogram(
+    "fhir_operation_duration_seconds",
+    "Time to answer a FHIR request, by operation",
+    ["operation"],
+)
+OPERATION_RESPONSES = Counter(
+    "fhir_operation_responses_total",
+    "FHIR responses by operation and status code",
+    ["operation", "status"],
+)
+BACKEND_LATENCY = Histogram(
+    "backend_call_duration_seconds",
+    "Time spent in calls to a backend (elasticsearch, db, icd11)",
+    ["backend", "call"],
+)
+EXPAND_SOURCE = Counter(
+    "valueset_expand_source_total",
+    "Filtered $expand requests by the backend that produced the result",
+    ["source"],
+)
+AUTOCODE_RESULTS = Counter(
+    "icd11_autocode_results_total",
+    "Best-effort autocode outcomes: tm2, mms (TM2 fell through), none, error",
+    ["linearization"],
+)
+
+# name -> callable returning {"hits": int, "misses": int}
+_cache_stats: dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """Expose a cache's hit/miss counters as ``cache_requests_total``."""
+    _cache_stats[name] = stats
+
+
+class _CacheCollector:
+    # Reads the caches' own counters at scrape time, so the cache hot
+    # paths need no extra bookkeeping
+    def collect(self):
+        family = CounterMetricFamily(
+            "cache_requests",
+            "Cache lookups by cache and result",
+            labels=["cache", "result"],
+        )
+        for name, stats in _cache_stats.items():
+            counts = stats()
+            family.add_metric([name, "hit"], counts["hits"])
+            family.add_metric([name, "miss"], counts["misses"])
+        yield family
+
+
+REGISTRY.register(_CacheCollector())
+
+
+@contextmanager
+def track(backend: str, call: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        BACKEND_LATENCY.labels(backend, call).observe(time.perf_counter() - start)
+
+
+def timed(backend: str, call: str | None = None):
+    """Record an async function's latency in ``backend_call_duration_seconds``."""
+
+    def decorate(fn):
+        name = call or fn.__name__
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with track(backend, name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement run through a SQLAlchemy (async) engine."""
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].lower() if statement else ""
+        BACKEND_LATENCY.labels("db", verb).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _failed(context):
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
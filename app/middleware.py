@@ -1,12 +1,16 @@
 import time
 import uuid
-from typing import Callable
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.middleware.cors import CORSMiddleware
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .config import get_settings
+from .metrics import OPERATION_LATENCY, OPERATION_RESPONSES
+from .security import decode_token
+from .services.audit import AuditWriter, audit_writer
+from .services.ratelimit import RateLimiter, rate_limiter
 
 
 def cors_options() -> dict:
@@ -20,24 +24,201 @@ def cors_options() -> dict:
     }
 
 
-class RequestContextMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        request.state.request_id = str(uuid.uuid4())
+class RequestContextMiddleware:
+    """Tags each HTTP request with an id and reports its handling time.
+
+    Pure ASGI: it only wraps ``send`` to add headers to the response start
+    message, so unlike ``BaseHTTPMiddleware`` it spawns no task and does not
+    re-stream the body.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = str(uuid.uuid4())
+        # Backs request.state.request_id
+        scope.setdefault("state", {})["request_id"] = request_id
         start = time.perf_counter()
-        response = await call_next(request)
-        duration = (time.perf_counter() - start) * 1000
-        response.headers["X-Request-ID"] = request.state.request_id
-        response.headers["X-Response-Time-ms"] = f"{duration:.2f}"
-        return response
 
+        async def send_with_context(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                duration = (time.perf_counter() - start) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("X-Response-Time-ms", f"{duration:.2f}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_context)
+
+
+# Route classes with their own buckets; other /fhir paths share "default".
+# Bundles can carry $translate entries, so they are billed like translate.
+ROUTE_CLASSES = {
+    "/fhir/ValueSet/$expand": "autocomplete",
+    "/fhir/ConceptMap/$translate": "translate",
+    "/fhir/Bundle": "translate",
+}
+
+
+def route_class(path: str) -> str | None:
+    if path in ROUTE_CLASSES:
+        return ROUTE_CLASSES[path]
+    if path.startswith("/fhir/"):
+        return "default"
+    return None
+
+
+def bearer_sub(scope: Scope) -> str | None:
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_token(token).get("sub")
+    except HTTPException:
+        return None
+
+
+def client_address(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def client_identity(scope: Scope) -> str:
+    """JWT ``sub`` of a valid bearer token, else the client address."""
+    sub = bearer_sub(scope)
+    return f"sub:{sub}" if sub else f"ip:{client_address(scope)}"
+
+
+class RateLimitMiddleware:
+    """Token-bucket limits per client and route class.
+
+    Answers 429 with ``Retry-After`` once a bucket is empty and adds
+    ``RateLimit-Limit``/``-Remaining``/``-Reset`` to every limited response.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter | None = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        # TODO: Integrate Redis-based token bucket
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        settings = get_settings()
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+        cls = route_class(scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+        decision = await self.limiter.hit(
+            f"{cls}:{client_identity(scope)}",
+            getattr(settings, f"rate_limit_{cls}_burst"),
+            getattr(settings, f"rate_limit_{cls}_per_second"),
+        )
+        if not decision.allowed:
+            response = ORJSONResponse(
+                {"detail": "Rate limit exceeded"},
+                status_code=429,
+                headers=dict(decision.headers()),
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_limits(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in decision.headers():
+                    headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_limits)
+
+
+def audit_target(path: str) -> tuple[str, str]:
+    """``(action, resource)`` for a /fhir path, e.g. ``("expand", "ValueSet")``."""
+    parts = path.split("/")[2:]
+    resource = parts[0] if parts else ""
+    if len(parts) > 1 and parts[-1].startswith("$"):
+        return parts[-1][1:], resource
+    return ("read" if len(parts) > 1 else "batch"), resource
+
+
+class AuditMiddleware:
+    """Queues one audit event per /fhir request once it has been answered.
+
+    Events go to the batched ``AuditWriter``, so the request never waits on
+    an INSERT. Must sit inside ``RequestContextMiddleware`` to see the
+    request id.
+    """
+
+    def __init__(self, app: ASGIApp, writer: AuditWriter | None = None):
+        self.app = app
+        self.writer = writer or audit_writer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/fhir")
+            or not get_settings().audit_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            action, resource = audit_target(scope["path"])
+            await self.writer.record(
+                {
+                    "request_id": scope.get("state", {}).get("request_id", ""),
+                    "user_sub": bearer_sub(scope),
+                    "action": action,
+                    "resource": resource,
+                    "path": scope["path"][:512],
+                    "method": scope["method"],
+                    "status_code": status_code,
+                    "details": {
+                        "query": scope["query_string"].decode("latin-1")[:1024],
+                        "client": client_address(scope),
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                    },
+                }
+            )
+
+
+class MetricsMiddleware:
+    """Per-operation latency histogram and response counts for /fhir requests."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/fhir"):
+            await self.app(scope, receive, send)
+            return
+        operation = audit_target(scope["path"])[0]
+        start = time.perf_counter()
+        status_code = 500
 
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        # TODO: Persist audit logs per ISO 22600 in DB
-        return await call_next(request)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            OPERATION_LATENCY.labels(operation).observe(time.perf_counter() - start)
+            OPERATION_RESPONSES.labels(operation, str(status_code)).inc()
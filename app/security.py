@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -6,9 +8,17 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
 from .config import get_settings
+from .metrics import register_cache
+from .services.cache import LRUCache
+from .services.jwks import jwks
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+token_cache = LRUCache(
+    get_settings().auth_token_cache_max_entries,
+    get_settings().auth_token_cache_ttl_seconds,
+)
+register_cache("auth_tokens", token_cache.stats.as_dict)
 
 
 def create_access_token(
@@ -32,23 +42,46 @@ def create_access_token(
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_alg)
 
 
-def decode_token(token: str) -> dict:
+def _verify(token: str) -> dict:
     settings = get_settings()
-    try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_secret,
-            algorithms=[settings.jwt_alg],
-            audience=settings.oauth2_audience,
-            issuer=settings.oauth2_issuer,
-        )
+    if jwks is None:
+        key, algorithms = settings.jwt_secret, [settings.jwt_alg]
+    else:
+        key = jwks.key_for(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        algorithms = [a.strip() for a in settings.oauth2_jwks_algorithms.split(",")]
+    return jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=settings.oauth2_audience,
+        issuer=settings.oauth2_issuer,
+    )
+
+
+def decode_token(token: str) -> dict:
+    """Verified claims of ``token``; a repeat token is served from cache.
+
+    Only successfully verified tokens are cached, keyed by their SHA-256,
+    and each entry expires with the token's ``exp``.
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    hit, payload = token_cache.get(key)
+    if hit and payload["exp"] > time.time():
         return payload
+    try:
+        payload = _verify(token)
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         ) from e
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        token_cache.set(key, payload, ttl=exp - time.time())
+    return payload
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     payload = decode_token(token)
     return {"sub": payload.get("sub"), "scopes": (payload.get("scope") or "").split()}
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from sqlalchemy import insert
+
+from ..config import get_settings
+from ..db.models import AuditLog
+from ..db.session import AsyncSessionLocal
+
+
+POLICIES = ("drop", "spill", "block")
+_STOP = object()
+
+
+class AuditWriter:
+    """Buffers audit events in memory and writes them in batches.
+
+    ``record`` only enqueues. A background task inserts up to ``batch_size``
+    events per multi-row INSERT, at least every ``flush_seconds`` while events
+    are pending. When the queue is full the ``policy`` decides: ``drop`` the
+    event, ``spill`` it to a JSON-lines file that is replayed on the next
+    start, or ``block`` the caller until there is room. Batches the DB rejects
+    are spilled too when a spill file is configured. Spill-file I/O runs on a
+    worker thread. Replay is at-least-once: a replay cut short by a crash is
+    retried from its ``.replay`` file on the next start.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        max_events: int = 10000,
+        batch_size: int = 500,
+        flush_seconds: float = 1.0,
+        policy: str = "drop",
+        spill_path: str | Path | None = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit backpressure policy: {policy}")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.policy = policy
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.queue: asyncio.Queue = asyncio.Queue(max_events)
+        self.written = self.dropped = self.spilled = 0
+        self._task: asyncio.Task | None = None
+        self._spill_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+    async def record(self, event: dict) -> None:
+        if not self.running:
+            if self._task is not None:
+                # Started, but the writer has died: count the loss
+                self.dropped += 1
+            return
+        event.setdefault("created_at", datetime.utcnow())
+        if self.policy == "block":
+            await self.queue.put(event)
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.policy == "spill" and self.spill_path:
+                await self._spill([event])
+            else:
+                self.dropped += 1
+
+    def start(self) -> None:
+        if not self.running:
+            # A fresh queue binds to the running loop
+            self.queue = asyncio.Queue(self.queue.maxsize)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything queued so far and stop the writer."""
+        if not self.running:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        try:
+            await self._replay_spill()
+        except Exception:
+            pass  # the spill files are kept and retried on the next start
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self.queue.get()
+            deadline = loop.time() + self.flush_seconds
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: list[dict]) -> bool:
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(AuditLog).values(batch))
+                await session.commit()
+        except Exception:
+            if self.spill_path:
+                await self._spill(batch)
+            else:
+                self.dropped += len(batch)
+            return False
+        self.written += len(batch)
+        return True
+
+    def _append(self, events: list[dict]) -> None:
+        data = b"".join(orjson.dumps(event) + b"\n" for event in events)
+        with self._spill_lock, self.spill_path.open("ab") as fh:
+            fh.write(data)
+
+    async def _spill(self, events: list[dict]) -> None:
+        try:
+            await asyncio.to_thread(self._append, events)
+        except OSError:
+            self.dropped += len(events)
+            return
+        self.spilled += len(events)
+
+    async def _replay_spill(self) -> None:
+        if not self.spill_path:
+            return
+        pending = self.spill_path.with_name(self.spill_path.name + ".replay")
+        if pending.exists():
+            # Left over from a replay that did not finish
+            await self._replay_file(pending)
+        if self.spill_path.exists():
+            # Renamed first so failed batches can spill again to a fresh file
+            os.replace(self.spill_path, pending)
+            await self._replay_file(pending)
+
+    async def _replay_file(self, path: Path) -> None:
+        events = []
+        for line in (await asyncio.to_thread(path.read_bytes)).splitlines():
+            if line.strip():
+                event = orjson.loads(line)
+                event["created_at"] = datetime.fromisoformat(event["created_at"])
+                events.append(event)
+        for i in range(0, len(events), self.batch_size):
+            await self._write(events[i : i + self.batch_size])
+        path.unlink()
+
+
+def create_audit_writer(session_factory) -> AuditWriter:
+    settings = get_settings()
+    return AuditWriter(
+        session_factory,
+        max_events=settings.audit_queue_max_events,
+        batch_size=settings.audit_batch_size,
+        flush_seconds=settings.audit_flush_seconds,
+        policy=settings.audit_backpressure,
+        spill_path=settings.audit_spill_path or None,
+    )
+
+
+audit_writer = create_audit_writer(AsyncSessionLocal)
@@ -0,0 +1,92 @@
+from bisect import bisect_left
+from typing import Iterable, List
+
+from .ingest import normalize_term
+
+
+# Field weights: a display hit outranks a synonym hit
+DISPLAY_WEIGHT = 3.0
+SYNONYM_WEIGHT = 2.0
+
+
+class AutocompleteEngine:
+    """In-memory prefix search over concept displays and synonyms.
+
+    Every (token, doc, field weight, token position) posting is kept in
+    parallel arrays sorted by token, so a query token's prefix range is two
+    ``bisect`` calls. Query tokens are all matched as prefixes and every one
+    must hit; a doc's score sums, per query token, its best posting,
+    ranked by field weight first, then earlier token positions.
+    """
+
+    def __init__(self):
+        self.generation: int | None = None
+        self._docs: list[dict] = []
+        self._tokens: list[str] = []
+        self._doc_ids: list[int] = []
+        self._weights: list[float] = []
+        self._positions: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def build(self, docs: Iterable[dict], generation: int | None = None) -> None:
+        postings: list[tuple[str, int, float, int]] = []
+        self._docs = []
+        for doc in docs:
+            doc_id = len(self._docs)
+            self._docs.append(
+                {
+                    "system": doc.get("system"),
+                    "code": doc.get("code"),
+                    "display": doc.get("display"),
+                }
+            )
+            fields = [(doc.get("display") or "", DISPLAY_WEIGHT)]
+            fields += [(s, SYNONYM_WEIGHT) for s in doc.get("synonyms") or []]
+            for text, weight in fields:
+                for pos, tok in enumerate(normalize_term(text).split()):
+                    postings.append((tok, doc_id, weight, pos))
+        postings.sort(key=lambda p: p[0])
+        self._tokens = [p[0] for p in postings]
+        self._doc_ids = [p[1] for p in postings]
+        self._weights = [p[2] for p in postings]
+        self._positions = [p[3] for p in postings]
+        self.generation = generation
+
+    def _prefix_scores(self, prefix: str) -> dict[int, float]:
+        lo = bisect_left(self._tokens, prefix)
+        hi = bisect_left(self._tokens, prefix + "\uffff", lo)
+        scores: dict[int, float] = {}
+        for i in range(lo, hi):
+            # Position and exact-token boosts stay below the gap between
+            # field weights, so a display hit always beats a synonym hit
+            score = self._weights[i] + 0.5 / (1 + self._positions[i])
+            if self._tokens[i] == prefix:
+                score += 0.25
+            doc_id = self._doc_ids[i]
+            if score > scores.get(doc_id, 0.0):
+                scores[doc_id] = score
+        return scores
+
+    def search(
+        self, term: str, size: int = 10, system: str | None = None
+    ) -> List[dict]:
+        query = normalize_term(term).split()
+        if not query or not self._tokens:
+            return []
+        totals: dict[int, float] | None = None
+        # Narrowest prefix first so later tokens only filter a small set
+        for scores in sorted(map(self._prefix_scores, set(query)), key=len):
+            if totals is None:
+                totals = scores
+            else:
+                totals = {d: s + scores[d] for d, s in totals.items() if d in scores}
+            if not totals:
+                return []
+        docs = self._docs
+        ranked = sorted(
+            (d for d in totals if system is None or docs[d]["system"] == system),
+            key=lambda d: (-totals[d], len(docs[d]["display"] or ""), docs[d]["code"]),
+        )
+        return [docs[d] for d in ranked[:size]]
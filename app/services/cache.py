@@ -0,0 +1,125 @@
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+import orjson
+
+
+# Redis value framing: one marker byte, then the (optionally deflated) JSON.
+# Values without a marker are legacy plain-JSON entries.
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+
+
+def encode(value: Any, compress_min_bytes: int = 1024) -> bytes:
+    data = orjson.dumps(value)
+    if len(data) >= compress_min_bytes:
+        return _ZLIB + zlib.compress(data, 6)
+    return _RAW + data
+
+
+def decode(raw: bytes) -> Any:
+    marker, body = raw[:1], raw[1:]
+    if marker == _ZLIB:
+        return orjson.loads(zlib.decompress(body))
+    if marker == _RAW:
+        return orjson.loads(body)
+    return orjson.loads(raw)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class LRUCache:
+    """Bounded in-process cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return False, None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class TieredCache:
+    """In-process LRU (L1) in front of Redis (L2).
+
+    Values cached here are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, redis=None, l1: LRUCache | None = None, compress_min_bytes=1024):
+        self.redis = redis
+        self.l1 = l1 or LRUCache()
+        self.l2_stats = CacheStats()
+        self.compress_min_bytes = compress_min_bytes
+
+    async def get(self, key: str) -> Any | None:
+        hit, value = self.l1.get(key)
+        if hit:
+            return value
+        if not self.redis:
+            return None
+        raw = await self.redis.get(key)
+        if not raw:
+            self.l2_stats.misses += 1
+            return None
+        self.l2_stats.hits += 1
+        value = decode(raw)
+        self.l1.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        self.l1.set(key, value, ttl)
+        if not self.redis:
+            return
+        await self.redis.setex(key, ttl, encode(value, self.compress_min_bytes))
+
+    def stats(self) -> dict:
+        return {
+            "l1": {**self.l1.stats.as_dict(), "size": len(self.l1)},
+            "l2": self.l2_stats.as_dict(),
+        }
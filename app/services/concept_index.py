@@ -0,0 +1,115 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..db.models import CodeSystem as CSModel, Concept as ConceptModel
+
+
+@dataclass
+class IndexedCodeSystem:
+    url: str
+    version: str
+    concepts: dict[str, dict] = field(default_factory=dict)
+
+
+class ConceptIndex:
+    """Process-local (system URL, version) -> code -> concept index.
+
+    Built lazily from the ``codesystems``/``concepts`` tables. Only the cheap
+    ``(id, url, version)`` columns are polled on refresh; a system's concepts
+    are only re-read when its signature changed.
+    """
+
+    def __init__(self, refresh_seconds: float = 300.0):
+        self.refresh_seconds = refresh_seconds
+        self._systems: dict[tuple[str, str], IndexedCodeSystem] = {}
+        self._current: dict[str, str] = {}
+        self._signatures: dict[str, tuple] = {}
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+        # Bumped whenever any system is (re)loaded or dropped
+        self.generation = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._checked_at is not None
+            and time.monotonic() - self._checked_at < self.refresh_seconds
+        )
+
+    def invalidate(self) -> None:
+        self._checked_at = None
+
+    async def refresh(self, db: AsyncSession, force: bool = False) -> None:
+        if not force and self._is_fresh():
+            return
+        async with self._lock:
+            if not force and self._is_fresh():
+                return
+            res = await db.execute(select(CSModel.id, CSModel.url, CSModel.version))
+            live: dict[str, tuple] = {}
+            for cs_pk, url, version in res.all():
+                sig = (cs_pk, version)
+                live[url] = sig
+                if self._signatures.get(url) == sig:
+                    continue
+                self._store(url, version, await self._load_concepts(db, cs_pk, url))
+                self._signatures[url] = sig
+                self.generation += 1
+            for url in set(self._current) - set(live):
+                self._drop(url)
+                self.generation += 1
+            self._checked_at = time.monotonic()
+
+    async def _load_concepts(
+        self, db: AsyncSession, cs_pk: int, url: str
+    ) -> list[dict]:
+        res = await db.execute(
+            select(
+                ConceptModel.code,
+                ConceptModel.display,
+                ConceptModel.definition,
+                ConceptModel.synonyms,
+            ).where(ConceptModel.system == url)
+        )
+        rows = res.all()
+        if rows:
+            return [
+                {
+                    "code": code,
+                    "display": display,
+                    "definition": definition,
+                    "synonyms": synonyms or [],
+                }
+                for code, display, definition, synonyms in rows
+            ]
+        # CodeSystems ingested before the concepts table existed
+        res = await db.execute(select(CSModel.content).where(CSModel.id == cs_pk))
+        return (res.scalar_one_or_none() or {}).get("concept", [])
+
+    def _store(self, url: str, version: str, concepts: list[dict]) -> None:
+        self._drop(url)
+        by_code = {c["code"]: c for c in concepts if c.get("code")}
+        self._systems[(url, version)] = IndexedCodeSystem(url, version, by_code)
+        self._current[url] = version
+
+    def _drop(self, url: str) -> None:
+        version = self._current.pop(url, None)
+        if version is not None:
+            self._systems.pop((url, version), None)
+        self._signatures.pop(url, None)
+
+    def systems(self) -> list[IndexedCodeSystem]:
+        return [self._systems[(url, v)] for url, v in self._current.items()]
+
+    def get(self, system: str, version: str | None = None) -> IndexedCodeSystem | None:
+        version = version or self._current.get(system)
+        if version is None:
+            return None
+        return self._systems.get((system, version))
+
+
+concept_index = ConceptIndex(get_settings().concept_index_refresh_seconds)
@@ -1,87 +1,237 @@
-import json
-from typing import Any, List, Dict, Optional
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional
 
 import httpx
-import redis
+from redis import asyncio as aioredis
 
 from ..config import get_settings
+from ..metrics import AUTOCODE_RESULTS, register_cache, timed
+from .cache import LRUCache, TieredCache
+from .singleflight import SingleFlight
 
 
 settings = get_settings()
-_redis = redis.from_url(settings.redis_url) if settings.redis_url else None
+ICD11_MMS = "http://id.who.int/icd/release/11/mms"
+ICD11_TM2 = "http://id.who.int/icd/release/11/tm2"
+_redis = aioredis.from_url(settings.redis_url) if settings.redis_url else None
+_cache = TieredCache(
+    _redis,
+    LRUCache(settings.icd_l1_cache_max_entries, settings.icd_l1_cache_ttl_seconds),
+    compress_min_bytes=settings.icd_cache_compress_min_bytes,
+)
+register_cache("icd11_l1", _cache.l1.stats.as_dict)
+register_cache("icd11_l2", _cache.l2_stats.as_dict)
 
 
-def _cache_get(key: str) -> Any | None:
-    if not _redis:
-        return None
-    raw = _redis.get(key)
-    return json.loads(raw) if raw else None
+async def _cache_get(key: str) -> Any | None:
+    return await _cache.get(key)
 
 
-def _cache_set(key: str, value: Any, ttl: int = 3600) -> None:
-    if not _redis:
-        return
-    _redis.setex(key, ttl, json.dumps(value))
+async def _cache_set(key: str, value: Any, ttl: int = 3600) -> None:
+    await _cache.set(key, value, ttl)
 
 
-def _get_access_token() -> str | None:
-    # Prefer static token if provided
-    if settings.who_api_token:
-        return settings.who_api_token
-    if not (
-        settings.who_token_url and settings.who_client_id and settings.who_client_secret
-    ):
-        return None
-    cache_key = "who:access_token"
-    if token := _cache_get(cache_key):
-        return token
-    data = {
-        "grant_type": "client_credentials",
-        "client_id": settings.who_client_id,
-        "client_secret": settings.who_client_secret,
-        "scope": settings.who_scope,
-    }
-    with httpx.Client(timeout=10.0) as client:
-        resp = client.post(settings.who_token_url, data=data)
-        if resp.status_code == 200:
-            tok = resp.json().get("access_token")
-            if tok:
-                _cache_set(cache_key, tok, ttl=3300)
-                return tok
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+_flight = SingleFlight(
+    _redis if settings.icd_singleflight_distributed else None,
+    lock_ttl_ms=settings.icd_singleflight_lock_ttl_ms,
+    wait_seconds=settings.icd_singleflight_wait_seconds,
+)
+_refreshing: set[asyncio.Task] = set()
+
+# A fetch returns (value, ttl); ttl=None means "upstream error, do not cache"
+Fetch = Callable[[], Awaitable[tuple[Any, Optional[int]]]]
+
+
+def _is_entry(entry: Any) -> bool:
+    return isinstance(entry, dict) and "fresh_until" in entry
+
+
+async def _fresh_entry(key: str) -> dict | None:
+    entry = await _cache_get(key)
+    if _is_entry(entry) and entry["fresh_until"] > time.time():
+        return entry
     return None
 
 
-def fetch_icd11_concept(code: str) -> dict | None:
+async def _load(key: str, fetch: Fetch) -> dict:
+    value, ttl = await fetch()
+    entry = {"value": value, "fresh_until": time.time() + (ttl or 0)}
+    if ttl:
+        # Keep the entry past its freshness so it can be served stale
+        await _cache_set(key, entry, ttl=ttl + settings.icd_max_stale_seconds)
+    return entry
+
+
+def _refresh_in_background(key: str, fetch: Fetch) -> None:
+    async def refresh():
+        try:
+            await _flight.do(key, lambda: _load(key, fetch), cache_get=_fresh_entry)
+        except Exception:
+            pass  # keep serving the stale entry until it hard-expires
+
+    task = asyncio.ensure_future(refresh())
+    _refreshing.add(task)
+    task.add_done_callback(_refreshing.discard)
+
+
+async def _cached_fetch(key: str, fetch: Fetch) -> Any | None:
+    """Serve ``key`` from cache, else run ``fetch`` once for all waiters.
+
+    Entries past ``fresh_until`` are returned as-is while one background
+    refresh runs (stale-while-revalidate), for at most ``icd_max_stale_seconds``;
+    older entries (which an L2 hit may have copied into L1 with a new L1 TTL)
+    are misses. Negative results are cached too, with the shorter TTL chosen
+    by ``fetch``.
+    """
+    entry = await _cache_get(key)
+    now = time.time()
+    if _is_entry(entry) and entry["fresh_until"] + settings.icd_max_stale_seconds > now:
+        if entry["fresh_until"] <= now:
+            _refresh_in_background(key, fetch)
+        return entry["value"]
+    entry = await _flight.do(key, lambda: _load(key, fetch), cache_get=_fresh_entry)
+    return entry["value"]
+
+
+class ICDClient:
+    """Shared keep-alive client for the WHO ICD-API.
+
+    One ``httpx.AsyncClient`` (and so one connection pool) per process; the
+    OAuth client-credentials token is held in memory and renewed
+    ``who_token_refresh_margin_seconds`` before it expires.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None):
+        # ``transport`` lets tests and tools point the client at a local stub
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._token: str | None = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                http2=settings.who_http2,
+                timeout=httpx.Timeout(
+                    settings.who_timeout_seconds,
+                    connect=settings.who_connect_timeout_seconds,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.who_max_connections,
+                    max_keepalive_connections=settings.who_max_keepalive_connections,
+                    keepalive_expiry=settings.who_keepalive_expiry_seconds,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _token_valid(self) -> bool:
+        return bool(self._token) and time.monotonic() < self._token_expires_at
+
+    async def access_token(self) -> str | None:
+        # Prefer static token if provided
+        if settings.who_api_token:
+            return settings.who_api_token
+        if not (
+            settings.who_token_url
+            and settings.who_client_id
+            and settings.who_client_secret
+        ):
+            return None
+        if self._token_valid():
+            return self._token
+        async with self._token_lock:
+            if self._token_valid():
+                return self._token
+            data = {
+                "grant_type": "client_credentials",
+                "client_id": settings.who_client_id,
+                "client_secret": settings.who_client_secret,
+                "scope": settings.who_scope,
+            }
+            resp = await self.client.post(settings.who_token_url, data=data)
+            if resp.status_code != 200:
+                return None
+            body = resp.json()
+            tok = body.get("access_token")
+            if not tok:
+                return None
+            expires_in = int(body.get("expires_in") or 3600)
+            self._token = tok
+            self._token_expires_at = (
+                time.monotonic()
+                + expires_in
+                - settings.who_token_refresh_margin_seconds
+            )
+            return tok
+
+    def invalidate_token(self) -> None:
+        self._token = None
+        self._token_expires_at = 0.0
+
+    async def headers(self) -> Dict[str, str]:
+        h = {
+            "API-Version": settings.who_api_version or "v2",
+            "Accept-Language": settings.who_language or "en",
+        }
+        tok = await self.access_token()
+        if tok:
+            h["Authorization"] = f"Bearer {tok}"
+        return h
+
+    async def get(self, url: str, params: dict | None = None) -> httpx.Response:
+        resp = await self.client.get(url, params=params, headers=await self.headers())
+        if resp.status_code == 401 and not settings.who_api_token and self._token:
+            # Token revoked or expired early; fetch a new one and retry once
+            self.invalidate_token()
+            resp = await self.client.get(
+                url, params=params, headers=await self.headers()
+            )
+        return resp
+
+
+icd_client = ICDClient()
+
+
+async def _get_access_token() -> str | None:
+    return await icd_client.access_token()
+
+
+def _ttl(value: Any, ttl: int) -> int:
+    return ttl if value else settings.icd_negative_ttl_seconds
+
+
+@timed("icd11")
+async def fetch_icd11_concept(code: str) -> dict | None:
     cache_key = f"icd11:{code}"
-    if cached := _cache_get(cache_key):
-        return cached
-
-    headers = {}
-    token = _get_access_token()
-    if token:
-        headers["Authorization"] = f"Bearer {token}"
-    url = f"{settings.who_api_base}/mms/{code}"
-    with httpx.Client(timeout=10.0) as client:
-        resp = client.get(url, headers=headers)
+
+    async def fetch() -> tuple[dict | None, int | None]:
+        url = f"{settings.who_api_base}/mms/{code}"
+        resp = await icd_client.get(url)
         if resp.status_code == 200:
             data = resp.json()
-            _cache_set(cache_key, data, ttl=6 * 3600)
-            return data
-    return None
-
+            return data, _ttl(data, 6 * 3600)
+        if resp.status_code == 404:
+            return None, settings.icd_negative_ttl_seconds
+        return None, None
 
-def _headers() -> Dict[str, str]:
-    h = {
-        "API-Version": settings.who_api_version or "v2",
-        "Accept-Language": settings.who_language or "en",
-    }
-    tok = _get_access_token()
-    if tok:
-        h["Authorization"] = f"Bearer {tok}"
-    return h
+    return await _cached_fetch(cache_key, fetch)
 
 
-def search_icd11(
+@timed("icd11")
+async def search_icd11(
     term: str,
     linearization: str = "mms",
     size: int = 1,
@@ -91,20 +241,18 @@ def search_icd11(
         return []
     rel = release_id or settings.who_release_id
     cache_key = f"icd11:search:{rel}:{linearization}:{term}:{size}"
-    if cached := _cache_get(cache_key):
-        return cached
-
-    url = f"{settings.who_api_base}/{linearization}/search"
-    params = {
-        "q": term,
-        "useFlexisearch": "true",
-        "flatResults": "true",
-        "propertiesToBeSearched": "Title,IndexTerm,FullySpecifiedName",
-        "returnType": "json",
-        "limit": str(size),
-    }
-    with httpx.Client(timeout=10.0) as client:
-        resp = client.get(url, params=params, headers=_headers())
+
+    async def fetch() -> tuple[List[Dict], int | None]:
+        url = f"{settings.who_api_base}/{linearization}/search"
+        params = {
+            "q": term,
+            "useFlexisearch": "true",
+            "flatResults": "true",
+            "propertiesToBeSearched": "Title,IndexTerm,FullySpecifiedName",
+            "returnType": "json",
+            "limit": str(size),
+        }
+        resp = await icd_client.get(url, params=params)
         if resp.status_code == 200:
             data = resp.json()
             # API may return {"destinationEntities": [...]} or {"results": [...]}
@@ -115,12 +263,16 @@ def search_icd11(
                 or []
             )
             if isinstance(items, list):
-                _cache_set(cache_key, items, ttl=3600)
-                return items
-    return []
+                return items, _ttl(items, 3600)
+        if resp.status_code == 404:
+            return [], settings.icd_negative_ttl_seconds
+        return [], None
 
+    return await _cached_fetch(cache_key, fetch) or []
 
-def autocode_icd11(
+
+@timed("icd11")
+async def autocode_icd11(
     text: str,
     linearization: str = "mms",
     release_id: Optional[str] = None,
@@ -129,20 +281,26 @@ def autocode_icd11(
         return None
     rel = release_id or settings.who_release_id
     cache_key = f"icd11:autocode:{rel}:{linearization}:{text}"
-    if cached := _cache_get(cache_key):
-        return cached
-    url = f"{settings.who_api_base}/{linearization}/autocode"
-    params = {"searchText": text}
-    with httpx.Client(timeout=10.0) as client:
-        resp = client.get(url, params=params, headers=_headers())
+
+    async def fetch() -> tuple[Dict | None, int | None]:
+        url = f"{settings.who_api_base}/{linearization}/autocode"
+        params = {"searchText": text}
+        resp = await icd_client.get(url, params=params)
         if resp.status_code == 200:
             data = resp.json()
-            _cache_set(cache_key, data, ttl=1800)
-            return data
-    return None
+            # A 200 without theCode means "no match": cache it briefly
+            return data, _ttl(data and data.get("theCode"), 1800)
+        if resp.status_code == 404:
+            return None, settings.icd_negative_ttl_seconds
+        # Let callers tell "no match" from "WHO unavailable"
+        resp.raise_for_status()
+        return None, None
 
+    return await _cached_fetch(cache_key, fetch)
 
-def codeinfo_icd11(
+
+@timed("icd11")
+async def codeinfo_icd11(
     code: str,
     linearization: str = "mms",
     release_id: Optional[str] = None,
@@ -151,13 +309,40 @@ def codeinfo_icd11(
         return None
     rel = release_id or settings.who_release_id
     cache_key = f"icd11:codeinfo:{rel}:{linearization}:{code}"
-    if cached := _cache_get(cache_key):
-        return cached
-    url = f"{settings.who_api_base}/{linearization}/codeinfo/{code}"
-    with httpx.Client(timeout=10.0) as client:
-        resp = client.get(url, headers=_headers())
+
+    async def fetch() -> tuple[Dict | None, int | None]:
+        url = f"{settings.who_api_base}/{linearization}/codeinfo/{code}"
+        resp = await icd_client.get(url)
         if resp.status_code == 200:
             data = resp.json()
-            _cache_set(cache_key, data, ttl=6 * 3600)
-            return data
-    return None
+            return data, _ttl(data, 6 * 3600)
+        if resp.status_code == 404:
+            return None, settings.icd_negative_ttl_seconds
+        # Let callers tell "not found" from "WHO unavailable"
+        resp.raise_for_status()
+        return None, None
+
+    return await _cached_fetch(cache_key, fetch)
+
+
+@timed("icd11")
+async def autocode_best_effort(
+    text: str, release_id: Optional[str] = None, raise_errors: bool = False
+) -> tuple[Dict | None, str | None]:
+    """Autocode ``text`` against TM2, then MMS; returns (result, system URI)."""
+    try:
+        ac = await autocode_icd11(text, linearization="tm2", release_id=release_id)
+        if ac and ac.get("theCode"):
+            AUTOCODE_RESULTS.labels("tm2").inc()
+            return ac, ICD11_TM2
+        ac = await autocode_icd11(text, linearization="mms", release_id=release_id)
+        if ac and ac.get("theCode"):
+            AUTOCODE_RESULTS.labels("mms").inc()
+            return ac, ICD11_MMS
+    except Exception:
+        AUTOCODE_RESULTS.labels("error").inc()
+        if raise_errors:
+            raise
+        return None, None
+    AUTOCODE_RESULTS.labels("none").inc()
+    return None, None
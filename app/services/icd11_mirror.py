@@ -0,0 +1,203 @@
+import asyncio
+from typing import AsyncIterator, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..db.models import ICD11Entity
+from .icd11 import ICDClient, icd_client
+from .ingest import normalize_term
+
+
+settings = get_settings()
+# asyncpg caps a statement at 32767 bind parameters
+ENTITY_CHUNK_SIZE = 500
+
+
+def _label(value) -> str | None:
+    if isinstance(value, dict):
+        return value.get("@value")
+    return value
+
+
+def _rebase(uri: str, base_url: str) -> str:
+    """Point a canonical ``http://id.who.int/...`` URI at the configured host."""
+    u, b = urlsplit(uri), urlsplit(base_url)
+    return urlunsplit((b.scheme, b.netloc, u.path, u.query, ""))
+
+
+def parse_entity(doc: dict, uri: str, release_id: str, linearization: str) -> dict:
+    parents = doc.get("parent") or []
+    title = _label(doc.get("title"))
+    return {
+        "release_id": release_id,
+        "linearization": linearization,
+        "entity_uri": doc.get("@id") or uri,
+        "code": doc.get("code") or None,
+        "title": title,
+        "normalized_title": normalize_term(title) or None,
+        "class_kind": doc.get("classKind"),
+        "parent_uri": parents[0] if parents else None,
+        "synonyms": [
+            t for s in doc.get("synonym") or [] if (t := _label(s.get("label")))
+        ],
+        "index_terms": [
+            t for s in doc.get("indexTerm") or [] if (t := _label(s.get("label")))
+        ],
+    }
+
+
+async def crawl_linearization(
+    client: ICDClient,
+    linearization: str,
+    release_id: str,
+    base_url: str,
+    concurrency: int = 8,
+    retries: int = 3,
+) -> AsyncIterator[dict]:
+    """Walk a linearization breadth-first, yielding one row per entity."""
+    sem = asyncio.Semaphore(concurrency)
+    root_url = f"{base_url}/{linearization}"
+
+    async def fetch(uri: str) -> dict | None:
+        async with sem:
+            for attempt in range(retries):
+                resp = await client.get(_rebase(uri, root_url))
+                if resp.status_code == 200:
+                    return resp.json()
+                if resp.status_code == 404:
+                    return None
+                if attempt < retries - 1:
+                    await asyncio.sleep(2**attempt)
+            resp.raise_for_status()
+            return None
+
+    root = await fetch(root_url)
+    if root is None:
+        raise RuntimeError(f"ICD-11 linearization not found: {root_url}")
+    codes: dict[str, str | None] = {}
+    level = list(dict.fromkeys(root.get("child") or []))
+    seen = set(level)
+    while level:
+        docs = await asyncio.gather(*(fetch(uri) for uri in level))
+        next_level: list[str] = []
+        for uri, doc in zip(level, docs):
+            if doc is None:
+                continue
+            row = parse_entity(doc, uri, release_id, linearization)
+            codes[uri] = row["code"]
+            row["parent_code"] = codes.get(row["parent_uri"])
+            yield row
+            for child in doc.get("child") or []:
+                if child not in seen:
+                    seen.add(child)
+                    next_level.append(child)
+        level = next_level
+
+
+async def store_entities(session: AsyncSession, rows: list[dict]) -> None:
+    for i in range(0, len(rows), ENTITY_CHUNK_SIZE):
+        stmt = insert(ICD11Entity).values(rows[i : i + ENTITY_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                ICD11Entity.release_id,
+                ICD11Entity.linearization,
+                ICD11Entity.entity_uri,
+            ],
+            set_={
+                col: getattr(stmt.excluded, col)
+                for col in (
+                    "code",
+                    "title",
+                    "normalized_title",
+                    "class_kind",
+                    "parent_uri",
+                    "parent_code",
+                    "synonyms",
+                    "index_terms",
+                )
+            },
+        )
+        await session.execute(stmt)
+
+
+async def sync_linearization(
+    session: AsyncSession,
+    linearization: str,
+    release_id: Optional[str] = None,
+    base_url: Optional[str] = None,
+    client: ICDClient | None = None,
+    concurrency: Optional[int] = None,
+) -> int:
+    """Mirror a whole linearization of ``release_id`` into ``icd11_entities``."""
+    rel = release_id or settings.who_release_id
+    batch: list[dict] = []
+    total = 0
+    async for row in crawl_linearization(
+        client or icd_client,
+        linearization,
+        rel,
+        base_url or settings.who_api_base,
+        concurrency=concurrency or settings.icd11_mirror_sync_concurrency,
+    ):
+        batch.append(row)
+        if len(batch) >= ENTITY_CHUNK_SIZE:
+            await store_entities(session, batch)
+            await session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        await store_entities(session, batch)
+        await session.commit()
+        total += len(batch)
+    return total
+
+
+async def mirror_title_matches(
+    db: AsyncSession, terms: Iterable[str], release_id: Optional[str] = None
+) -> dict[str, ICD11Entity]:
+    """Coded entities whose title matches a term; TM2 beats MMS.
+
+    Both sides go through ``normalize_term``; results are keyed by the
+    normalized title.
+    """
+    terms = list(dict.fromkeys(t for t in map(normalize_term, terms) if t))
+    if not settings.icd11_mirror_enabled or not terms:
+        return {}
+    res = await db.execute(
+        select(ICD11Entity).where(
+            ICD11Entity.release_id == (release_id or settings.who_release_id),
+            ICD11Entity.normalized_title.in_(terms),
+            ICD11Entity.linearization.in_(["tm2", "mms"]),
+            ICD11Entity.code.is_not(None),
+        )
+    )
+    out: dict[str, ICD11Entity] = {}
+    for entity in res.scalars():
+        key = entity.normalized_title
+        if key not in out or entity.linearization == "tm2":
+            out[key] = entity
+    return out
+
+
+async def mirror_lookup(
+    db: AsyncSession,
+    code: str,
+    linearization: str = "mms",
+    release_id: Optional[str] = None,
+) -> ICD11Entity | None:
+    if not settings.icd11_mirror_enabled:
+        return None
+    res = await db.execute(
+        select(ICD11Entity)
+        .where(
+            ICD11Entity.release_id == (release_id or settings.who_release_id),
+            ICD11Entity.linearization == linearization,
+            ICD11Entity.code == code,
+        )
+        .limit(1)
+    )
+    return res.scalar_one_or_none()
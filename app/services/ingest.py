@@ -1,36 +1,155 @@
+from hashlib import md5, sha256
+from itertools import chain, islice
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Iterator, TypeVar
 import re
+import unicodedata
 
-import pandas as pd
+import orjson
 from fhir.resources.codesystem import CodeSystem
 from fhir.resources.conceptmap import ConceptMap
 
 
-def _read_rows(file_path: Path) -> list[dict]:
-    suffix = file_path.suffix.lower()
-    if suffix == ".xls":
-        import xlrd  # type: ignore
+T = TypeVar("T")
+# AYU-SAT glosses longer than this are definitions rather than synonyms
+MAX_GLOSS_WORDS = 4
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _is_zip(file_path: Path) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(4) == b"PK\x03\x04"
+
 
-        wb = xlrd.open_workbook(str(file_path))
-        sheet = wb.sheet_by_index(0)
-        headers = [str(h).strip() for h in sheet.row_values(0)]
-        rows: list[dict] = []
-        for r in range(1, sheet.nrows):
-            vals = sheet.row_values(r)
-            row = {headers[i]: vals[i] for i in range(min(len(headers), len(vals)))}
-            rows.append(row)
-        return rows
+def _raw_rows(file_path: Path) -> Iterator[tuple]:
+    # Sniff the container rather than trusting the suffix: some AYUSH
+    # ".xlsx" files are really legacy BIFF workbooks
+    if _is_zip(file_path):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from wb.worksheets[0].iter_rows(values_only=True)
+        finally:
+            wb.close()
     else:
-        df = pd.read_excel(file_path, engine="openpyxl")
-        return df.to_dict(orient="records")
+        import xlrd  # type: ignore
+
+        wb = xlrd.open_workbook(str(file_path), on_demand=True)
+        try:
+            sheet = wb.sheet_by_index(0)
+            for r in range(sheet.nrows):
+                yield sheet.row_values(r)
+        finally:
+            wb.release_resources()
+
+
+def iter_rows(file_path: Path) -> Iterator[dict]:
+    """Stream the first sheet as dicts keyed by the header row."""
+    rows = _raw_rows(file_path)
+    header = next(rows, None)
+    if header is None:
+        return
+    headers = [
+        str(h).strip() if h is not None else f"Unnamed: {i}"
+        for i, h in enumerate(header)
+    ]
+    for vals in rows:
+        if all(v is None or v == "" for v in vals):
+            continue
+        yield dict(zip(headers, vals))
+
+
+def _read_rows(file_path: Path) -> list[dict]:
+    return list(iter_rows(file_path))
+
+
+def normalize_term(text: str) -> str:
+    """Lowercase, strip diacritics and collapse punctuation/whitespace."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^0-9a-z]+", " ", text.lower()).strip()
+
+
+def concept_rows(
+    system: str,
+    concepts: Iterable[dict],
+    synonyms_for: Callable[[str], list[str]] | None = None,
+) -> list[dict]:
+    # Keyed by code: a batch upsert cannot touch the same (system, code) twice
+    rows: dict[str, dict] = {}
+    for c in concepts:
+        display = c.get("display") or c["code"]
+        rows[c["code"]] = {
+            "system": system,
+            "code": c["code"],
+            "display": display,
+            "definition": c.get("definition"),
+            "normalized_display": normalize_term(display),
+            "synonyms": synonyms_for(str(display)) if synonyms_for else [],
+        }
+    return list(rows.values())
+
+
+def file_hash(file_path: Path) -> str:
+    h = sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(1 << 20):
+            h.update(block)
+    return h.hexdigest()
+
+
+def concept_hash(row: dict) -> str:
+    """Fingerprint of the stored fields of a ``concept_rows`` row."""
+    payload = [row.get("display"), row.get("definition"), row.get("synonyms") or []]
+    return md5(orjson.dumps(payload)).hexdigest()
+
+
+def diff_concepts(
+    existing: dict[str, str], rows: Iterable[dict]
+) -> tuple[list[dict], list[dict], list[str]]:
+    """Split ``rows`` against ``{code: concept_hash}`` of the stored concepts.
+
+    Returns ``(added, changed, retired_codes)``.
+    """
+    added: list[dict] = []
+    changed: list[dict] = []
+    seen: set[str] = set()
+    for row in rows:
+        code = row["code"]
+        seen.add(code)
+        if code not in existing:
+            added.append(row)
+        elif existing[code] != concept_hash(row):
+            changed.append(row)
+    return added, changed, [code for code in existing if code not in seen]
+
+
+def bump_version(version: str | None) -> str:
+    """``1.0.0`` -> ``1.0.1``; versions without a numeric tail get ``.1``."""
+    if not version:
+        return "1.0.0"
+    head, _, last = version.rpartition(".")
+    if last.isdigit():
+        return f"{head}.{int(last) + 1}" if head else str(int(last) + 1)
+    return f"{version}.1"
 
 
 def load_namaste_codes(file_path: Path) -> list[dict]:
-    rows = _read_rows(file_path)
-    if not rows:
-        return []
-    columns = list(rows[0].keys())
+    return list(iter_namaste_codes(file_path))
+
+
+def iter_namaste_codes(file_path: Path) -> Iterator[dict]:
+    rows = iter_rows(file_path)
+    first = next(rows, None)
+    if first is None:
+        return
+    columns = list(first.keys())
     cols_map = {c.lower(): c for c in columns}
     code_col = cols_map.get("code") or next(
         (c for c in columns if "code" in c.lower()), None
@@ -54,8 +173,7 @@ def load_namaste_codes(file_path: Path) -> list[dict]:
         )
     )
     definition_col = cols_map.get("definition") or None
-    items: list[dict] = []
-    for row in rows:
+    for row in chain([first], rows):
         raw_code = row.get(code_col) if code_col else None
         code = str(raw_code).strip() if raw_code is not None else ""
         if not code or code.lower() == "nan":
@@ -68,18 +186,17 @@ def load_namaste_codes(file_path: Path) -> list[dict]:
         concept = {"code": code, "display": display}
         if definition:
             concept["definition"] = definition
-        items.append(concept)
-    return items
+        yield concept
 
 
 def build_codesystem(
-    cs_id: str, url: str, title: str, concepts: list[dict]
+    cs_id: str, url: str, title: str, concepts: list[dict], version: str = "1.0.0"
 ) -> CodeSystem:
     payload = {
         "resourceType": "CodeSystem",
         "id": cs_id,
         "url": url,
-        "version": "1.0.0",
+        "version": version,
         "name": cs_id.replace("-", "").title(),
         "title": title,
         "status": "active",
@@ -178,14 +295,42 @@ def load_icd10_mapping_rows(file_path: Path) -> list[tuple[str, str, str | None]
     return out
 
 
+def synonym_tables(data_dir: Path) -> list[Path]:
+    return sorted(data_dir.glob("ayu-sat-table-*.xlsx"))
+
+
 def load_ayu_synonyms(data_dir: Path) -> dict[str, list[str]]:
     syn_map: dict[str, list[str]] = {}
-    for p in sorted(data_dir.glob("ayu-sat-table-*.xlsx")):
-        try:
-            df = pd.read_excel(p, engine="openpyxl")
-        except Exception:
-            continue
-        cols = [c for c in df.columns]
+    for p in synonym_tables(data_dir):
+        merge_synonyms(syn_map, load_synonym_table(p))
+    return syn_map
+
+
+def load_synonym_table(p: Path) -> dict[str, list[str]]:
+    """Read one synonym workbook into ``term -> synonyms``.
+
+    Understands ``Term``/``Synonyms`` sheets (synonyms split on ``,;|``) and
+    the AYU-SAT layout, where ``Word`` holds ``/``-separated variants and a
+    short ``Short Defination`` gloss is a synonym too.
+    """
+    syn_map: dict[str, list[str]] = {}
+    seen: dict[str, set[str]] = {}
+
+    def add(term: str, syns: list[str]) -> None:
+        key = term.lower()
+        known = seen.setdefault(key, set())
+        values = syn_map.setdefault(key, [])
+        for s in syns:
+            if s.lower() not in known:
+                known.add(s.lower())
+                values.append(s)
+
+    try:
+        rows = iter_rows(p)
+        first = next(rows, None)
+        if first is None:
+            return syn_map
+        cols = list(first.keys())
         lower = {c.lower(): c for c in cols}
         term_col = (
             lower.get("term")
@@ -197,25 +342,46 @@ def load_ayu_synonyms(data_dir: Path) -> dict[str, list[str]]:
             or lower.get("synonyms")
             or next((c for c in cols if "synonym" in c.lower()), None)
         )
-        if not term_col or not syn_col:
-            continue
-        for _, row in df.iterrows():
-            term = str(row.get(term_col) or "").strip()
-            syns_raw = row.get(syn_col)
-            if not term or not syns_raw:
-                continue
-            syns = []
-            if isinstance(syns_raw, str):
+        word_col = lower.get("word")
+        gloss_col = next((c for c in cols if c.lower().startswith("short defin")), None)
+        for row in chain([first], rows):
+            if term_col and syn_col:
+                term = str(row.get(term_col) or "").strip()
+                syns_raw = row.get(syn_col)
+                if not term or not isinstance(syns_raw, str):
+                    continue
                 # split on common delimiters
-                for part in re.split(r"[,;|]", syns_raw):
-                    val = part.strip()
-                    if val:
-                        syns.append(val)
-            elif isinstance(syns_raw, list):
-                syns = [str(s).strip() for s in syns_raw if str(s).strip()]
-            key = term.lower()
-            syn_map.setdefault(key, [])
-            for s in syns:
-                if s.lower() not in [x.lower() for x in syn_map[key]]:
-                    syn_map[key].append(s)
+                syns = [
+                    v for part in re.split(r"[,;|]", syns_raw) if (v := part.strip())
+                ]
+            elif word_col:
+                variants = [
+                    v
+                    for part in str(row.get(word_col) or "").split("/")
+                    if (v := part.strip())
+                ]
+                gloss = str(row.get(gloss_col) or "").strip() if gloss_col else ""
+                if gloss and len(gloss.split()) <= MAX_GLOSS_WORDS:
+                    variants += [v for g in gloss.split("/") if (v := g.strip())]
+                if len(variants) < 2:
+                    continue
+                term, syns = variants[0], variants[1:]
+            else:
+                return syn_map
+            add(term, syns)
+    except Exception:
+        pass
+    return syn_map
+
+
+def merge_synonyms(
+    syn_map: dict[str, list[str]], other: dict[str, list[str]]
+) -> dict[str, list[str]]:
+    for key, syns in other.items():
+        values = syn_map.setdefault(key, [])
+        known = {x.lower() for x in values}
+        for s in syns:
+            if s.lower() not in known:
+                known.add(s.lower())
+                values.append(s)
     return syn_map
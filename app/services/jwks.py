@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import httpx
+
+from ..config import get_settings
+
+
+class JWKSCache:
+    """Signing keys of an external issuer, kept in memory by ``kid``.
+
+    The JWKS document is fetched on ``start`` and then refreshed by a
+    background task, so token verification never waits on the network. An
+    unknown ``kid`` schedules an early refresh (at most one per
+    ``min_refresh_seconds``) and is rejected until it has arrived.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        refresh_seconds: float = 3600.0,
+        min_refresh_seconds: float = 30.0,
+        timeout: float = 5.0,
+    ):
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+        self.keys: dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    async def refresh(self) -> None:
+        self._fetched_at = time.monotonic()
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            res = await client.get(self.url)
+            res.raise_for_status()
+            doc = res.json()
+        # Swapped in whole so concurrent readers see either key set
+        self.keys = {k.get("kid", ""): k for k in doc.get("keys", [])}
+
+    def key_for(self, kid: str | None) -> dict | None:
+        keys = self.keys
+        key = keys.get(kid or "")
+        if key is None and not kid and len(keys) == 1:
+            key = next(iter(keys.values()))
+        if key is None and self._wakeup is not None:
+            if time.monotonic() - self._fetched_at >= self.min_refresh_seconds:
+                self._wakeup.set()
+        return key
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        try:
+            await self.refresh()
+        except Exception:
+            pass  # the background loop keeps retrying
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # Retry sooner while no keys have been loaded yet
+            delay = self.refresh_seconds if self.keys else self.min_refresh_seconds
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.refresh()
+            except Exception:
+                pass  # keep verifying with the previous key set
+
+
+settings = get_settings()
+jwks = (
+    JWKSCache(
+        settings.oauth2_jwks_url,
+        refresh_seconds=settings.oauth2_jwks_refresh_seconds,
+    )
+    if settings.oauth2_jwks_url
+    else None
+)
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..config import get_settings
+from ..db.models import AutocodeCheckpoint, Concept, Mapping
+from .icd11 import autocode_best_effort
+
+
+settings = get_settings()
+
+
+def display_hash(display: str) -> str:
+    # Matches Postgres md5() so pending concepts can be selected in SQL
+    return hashlib.md5((display or "").encode("utf-8")).hexdigest()
+
+
+def match_score(ac: dict) -> float | None:
+    try:
+        return float(ac.get("matchScore"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _pending_concepts(release_id: str, after_id: int, limit: int, systems=None):
+    cp = AutocodeCheckpoint
+    stmt = (
+        select(Concept.id, Concept.system, Concept.code, Concept.display)
+        .outerjoin(
+            cp,
+            and_(cp.source_system == Concept.system, cp.source_code == Concept.code),
+        )
+        .where(
+            Concept.id > after_id,
+            or_(
+                cp.id.is_(None),
+                cp.release_id != release_id,
+                cp.display_hash != func.md5(Concept.display),
+            ),
+        )
+        .order_by(Concept.id)
+        .limit(limit)
+    )
+    if systems:
+        stmt = stmt.where(Concept.system.in_(systems))
+    return stmt
+
+
+async def _store_batch(
+    session: AsyncSession, release_id: str, done: list[tuple]
+) -> None:
+    keys = [(system, code) for system, code, _, _, _ in done]
+    await session.execute(
+        delete(Mapping).where(
+            Mapping.origin == "autocode",
+            tuple_(Mapping.source_system, Mapping.source_code).in_(keys),
+        )
+    )
+    rows = [
+        {
+            "source_system": system,
+            "source_code": code,
+            "target_system": target_system,
+            "target_code": ac["theCode"],
+            "equivalence": "relatedto",
+            "display": (ac.get("matchingText") or ac["theCode"])[:512],
+            "origin": "autocode",
+            "match_score": match_score(ac),
+            "release_id": release_id,
+        }
+        for system, code, _, ac, target_system in done
+        if ac
+    ]
+    if rows:
+        await session.execute(insert(Mapping).values(rows))
+    stmt = insert(AutocodeCheckpoint).values(
+        [
+            {
+                "source_system": system,
+                "source_code": code,
+                "display_hash": display_hash(display),
+                "release_id": release_id,
+                "matched": ac is not None,
+                "updated_at": func.now(),
+            }
+            for system, code, display, ac, _ in done
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            AutocodeCheckpoint.source_system,
+            AutocodeCheckpoint.source_code,
+        ],
+        set_={
+            "display_hash": stmt.excluded.display_hash,
+            "release_id": stmt.excluded.release_id,
+            "matched": stmt.excluded.matched,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def precompute_mappings(
+    session_factory: async_sessionmaker,
+    release_id: Optional[str] = None,
+    systems: Optional[list[str]] = None,
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """Autocode every new or changed concept into ``autocode`` Mapping rows.
+
+    Each batch is committed together with its checkpoints, so an
+    interrupted run resumes where it stopped; concepts whose display and
+    release are unchanged since their checkpoint are skipped. Concepts whose
+    autocode call failed upstream are left without a checkpoint and retried
+    on the next run.
+    """
+    rel = release_id or settings.who_release_id
+    sem = asyncio.Semaphore(concurrency or settings.mapping_job_concurrency)
+    limit = batch_size or settings.mapping_job_batch_size
+    stats = {"processed": 0, "matched": 0, "failed": 0}
+
+    async def autocode(display: str):
+        async with sem:
+            return await autocode_best_effort(
+                display, release_id=rel, raise_errors=True
+            )
+
+    after_id = 0
+    while True:
+        async with session_factory() as session:
+            res = await session.execute(
+                _pending_concepts(rel, after_id, limit, systems)
+            )
+            batch = res.all()
+            if not batch:
+                break
+            after_id = batch[-1][0]
+            results = await asyncio.gather(
+                *(autocode(display or code) for _, _, code, display in batch),
+                return_exceptions=True,
+            )
+            done = []
+            for (_, system, code, display), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    stats["failed"] += 1
+                    continue
+                ac, target_system = result
+                done.append((system, code, display, ac, target_system))
+                stats["matched"] += ac is not None
+            if done:
+                await _store_batch(session, rel, done)
+                await session.commit()
+            stats["processed"] += len(done)
+    return stats
@@ -0,0 +1,135 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from redis import asyncio as aioredis
+
+from ..config import get_settings
+from .circuit_breaker import CircuitBreaker
+
+
+# Atomic token bucket: refill by elapsed server time, then try to take
+# ``cost`` tokens. Tokens come back as a string so Redis keeps the fraction.
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call("TIME")
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again / until ``cost`` tokens exist
+    reset: int
+    retry_after: int
+
+    def headers(self) -> list[tuple[str, str]]:
+        headers = [
+            ("RateLimit-Limit", str(self.limit)),
+            ("RateLimit-Remaining", str(self.remaining)),
+            ("RateLimit-Reset", str(self.reset)),
+        ]
+        if not self.allowed:
+            headers.append(("Retry-After", str(self.retry_after)))
+        return headers
+
+
+def _decide(
+    allowed: bool, tokens: float, capacity: int, rate: float, cost: int
+) -> Decision:
+    return Decision(
+        allowed=allowed,
+        limit=capacity,
+        remaining=max(0, math.floor(tokens)),
+        reset=math.ceil(max(0.0, capacity - tokens) / rate),
+        retry_after=0 if allowed else max(1, math.ceil((cost - tokens) / rate)),
+    )
+
+
+class LocalBuckets:
+    """Per-process token buckets, used while Redis is unreachable.
+
+    Approximate: each worker enforces the full limit on its own.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: int, rate: float, cost: int = 1):
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - ts) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class RateLimiter:
+    """Token buckets shared through Redis, with a local fallback.
+
+    Redis gets at most ``timeout`` seconds per check. Failures feed a
+    circuit breaker, and while it is open checks go straight to the local
+    buckets without a round trip.
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        timeout: float = 0.05,
+        breaker: CircuitBreaker | None = None,
+        local: LocalBuckets | None = None,
+    ):
+        self.redis = redis
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(3, 5.0)
+        self.local = local or LocalBuckets()
+        self._script = redis.register_script(_TOKEN_BUCKET_LUA) if redis else None
+
+    async def hit(self, key: str, capacity: int, rate: float, cost: int = 1):
+        if self._script is not None and self.breaker.allow():
+            try:
+                allowed, tokens = await asyncio.wait_for(
+                    self._script(
+                        keys=[f"ratelimit:{key}"], args=[capacity, rate, cost]
+                    ),
+                    self.timeout,
+                )
+            except Exception:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+                return _decide(bool(int(allowed)), float(tokens), capacity, rate, cost)
+        allowed, tokens = self.local.take(key, capacity, rate, cost)
+        return _decide(allowed, tokens, capacity, rate, cost)
+
+
+settings = get_settings()
+rate_limiter = RateLimiter(
+    aioredis.from_url(settings.redis_url) if settings.redis_url else None,
+    timeout=settings.rate_limit_redis_timeout_seconds,
+)
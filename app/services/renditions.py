@@ -0,0 +1,103 @@
+import gzip
+
+import orjson
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..db.models import CodeSystem, CodeSystemRendition
+from ..metrics import register_cache
+from .cache import LRUCache
+
+try:  # optional: brotli variants are only produced when installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on installed extras
+    brotli = None
+
+
+# Server preference when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip", "identity")
+# Rendered bodies never change for a given (row, version)
+_bodies = LRUCache(get_settings().codesystem_cache_max_entries, ttl=86400.0)
+_contents = LRUCache(get_settings().codesystem_cache_max_entries, ttl=86400.0)
+register_cache("codesystem_bodies", _bodies.stats.as_dict)
+
+
+def render(content: dict) -> dict[str, bytes]:
+    body = orjson.dumps(content)
+    out = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        out["br"] = brotli.compress(body)
+    return out
+
+
+def pick_encoding(accept_encoding: str | None, available) -> str:
+    """Best of ``available`` for an ``Accept-Encoding`` header (q-values honoured)."""
+    weights: dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    default = weights.get("*", 0.0)
+    ranked = [
+        e
+        for e in ENCODINGS
+        if e in available and e != "identity" and weights.get(e, default) > 0
+    ]
+    ranked.sort(key=lambda e: -weights.get(e, default))
+    return ranked[0] if ranked else "identity"
+
+
+async def store_renditions(
+    session: AsyncSession, cs_id: str, version: str, content: dict
+) -> None:
+    """Replace the stored bodies of ``cs_id`` with those of ``version``."""
+    await session.execute(
+        delete(CodeSystemRendition).where(CodeSystemRendition.cs_id == cs_id)
+    )
+    session.add_all(
+        CodeSystemRendition(cs_id=cs_id, version=version, encoding=enc, body=body)
+        for enc, body in render(content).items()
+    )
+
+
+async def codesystem_content(db: AsyncSession, cs_pk: int, version: str) -> dict:
+    key = f"{cs_pk}:{version}"
+    hit, content = _contents.get(key)
+    if not hit:
+        res = await db.execute(select(CodeSystem.content).where(CodeSystem.id == cs_pk))
+        content = res.scalar_one()
+        _contents.set(key, content)
+    return content
+
+
+async def codesystem_bodies(
+    db: AsyncSession, cs_pk: int, cs_id: str, version: str
+) -> dict[str, bytes]:
+    """Encoded bodies for one CodeSystem version.
+
+    Served from the process cache, else the renditions written at ingest,
+    else rendered once from the stored content (older ingests).
+    """
+    key = f"{cs_pk}:{version}"
+    hit, bodies = _bodies.get(key)
+    if hit:
+        return bodies
+    res = await db.execute(
+        select(CodeSystemRendition.encoding, CodeSystemRendition.body).where(
+            CodeSystemRendition.cs_id == cs_id, CodeSystemRendition.version == version
+        )
+    )
+    bodies = dict(res.all())
+    if "identity" not in bodies:
+        bodies = render(await codesystem_content(db, cs_pk, version))
+    _bodies.set(key, bodies)
+    return bodies
@@ -1,11 +1,31 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
 from typing import Iterable, List
 
 from elasticsearch import Elasticsearch, helpers
 
+try:  # needs the `elasticsearch[async]` extra (aiohttp)
+    from elasticsearch import AsyncElasticsearch
+except ImportError:  # pragma: no cover - depends on installed extras
+    AsyncElasticsearch = None
+
 from ..config import get_settings
+from ..metrics import track
+from .circuit_breaker import CircuitBreaker
+from .ingest import chunked
 
 
 _client: Elasticsearch | None = None
+_async_client = None
+breaker = CircuitBreaker(
+    get_settings().search_breaker_failure_threshold,
+    get_settings().search_breaker_reset_seconds,
+)
+
+
+class SearchUnavailable(Exception):
+    pass
 
 
 def get_client() -> Elasticsearch:
@@ -16,70 +36,308 @@ def get_client() -> Elasticsearch:
     return _client
 
 
-def ensure_index(index: str):
+def get_async_client():
+    global _async_client
+    if _async_client is None and AsyncElasticsearch is not None:
+        settings = get_settings()
+        _async_client = AsyncElasticsearch(
+            settings.elasticsearch_url,
+            timeout=settings.search_timeout_seconds,
+            max_retries=0,
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+def index_body(replicas: int | None = None, refresh_interval: str = "1s") -> dict:
+    settings = get_settings()
+    return {
+        "settings": {
+            "number_of_replicas": (
+                settings.search_index_replicas if replicas is None else replicas
+            ),
+            "refresh_interval": refresh_interval,
+        },
+        "mappings": {
+            "properties": {
+                "system": {"type": "keyword"},
+                "code": {"type": "keyword"},
+                # Indexes the ._2gram/._3gram shingle and ._index_prefix
+                # subfields that the bool_prefix query below relies on
+                "display": {"type": "search_as_you_type"},
+                "synonyms": {"type": "search_as_you_type"},
+            }
+        },
+    }
+
+
+def _concrete_indices(es: Elasticsearch, alias: str) -> list[str]:
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+
+def ensure_index(alias: str):
+    """Make sure ``alias`` resolves to an index, creating the first build."""
     es = get_client()
-    if es.indices.exists(index=index):
+    if es.indices.exists(index=alias):
         return
-    es.indices.create(
-        index=index,
-        body={
-            "settings": {
-                "analysis": {
-                    "analyzer": {
-                        "autocomplete": {
-                            "tokenizer": "autocomplete",
-                            "filter": ["lowercase"],
-                        }
-                    },
-                    "tokenizer": {
-                        "autocomplete": {
-                            "type": "edge_ngram",
-                            "min_gram": 2,
-                            "max_gram": 20,
-                            "token_chars": ["letter", "digit", "whitespace"],
-                        }
-                    },
-                }
-            },
-            "mappings": {
-                "properties": {
-                    "system": {"type": "keyword"},
-                    "code": {"type": "keyword"},
-                    "display": {
-                        "type": "text",
-                        "analyzer": "autocomplete",
-                        "search_analyzer": "standard",
-                    },
-                    "synonyms": {"type": "text", "analyzer": "autocomplete"},
-                }
-            },
-        },
-    )
+    index = new_index_name(alias)
+    es.indices.create(index=index, body=index_body())
+    es.indices.put_alias(index=index, name=alias)
+
+
+def new_index_name(alias: str) -> str:
+    return f"{alias}-{datetime.now(timezone.utc):%Y%m%d%H%M%S%f}"
 
 
 def bulk_index(index: str, docs: Iterable[dict]):
-    es = get_client()
     ensure_index(index)
-    actions = [{"_index": index, "_source": d} for d in docs]
-    helpers.bulk(es, actions)
+    feed_index(index, docs)
+
+
+def run_bulk(actions: Iterable[dict], ignore_status: tuple[int, ...] = ()) -> int:
+    """Stream ``actions`` to ES in parallel chunks and return the count sent.
+
+    Chunks of ``SEARCH_BULK_CHUNK_SIZE`` actions are sent from
+    ``SEARCH_BULK_THREADS`` threads, with at most two chunks per thread in
+    flight. Items rejected with 429 are retried with exponential backoff up
+    to ``SEARCH_BULK_MAX_RETRIES`` times. Remaining item failures are
+    collected per chunk and raised together as a ``BulkIndexError``.
+    """
+    settings = get_settings()
+    es = get_client()
+    threads = max(1, settings.search_bulk_threads)
+
+    def send(n: int, chunk: list[dict]) -> tuple[int, int, list[dict]]:
+        failed = [
+            info
+            for _, info in helpers.streaming_bulk(
+                es,
+                chunk,
+                chunk_size=len(chunk),
+                max_retries=settings.search_bulk_max_retries,
+                raise_on_error=False,
+                yield_ok=False,
+                ignore_status=ignore_status,
+            )
+        ]
+        return n, len(chunk), failed
+
+    sent = 0
+    errors: list[dict] = []
+    failed_chunks: list[str] = []
+
+    def collect(futures) -> None:
+        nonlocal sent
+        for fut in futures:
+            n, size, failed = fut.result()
+            sent += size
+            if failed:
+                errors.extend(failed)
+                failed_chunks.append(f"chunk {n}: {len(failed)}/{size}")
+
+    with ThreadPoolExecutor(threads) as pool:
+        pending: set = set()
+        for n, chunk in enumerate(chunked(actions, settings.search_bulk_chunk_size)):
+            pending.add(pool.submit(send, n, chunk))
+            if len(pending) >= threads * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending).done)
+    if errors:
+        raise helpers.BulkIndexError(
+            f"{len(errors)} document(s) failed ({', '.join(failed_chunks)})", errors
+        )
+    return sent
 
 
-def autocomplete(index: str, term: str, size: int = 10) -> List[dict]:
+def reindex(alias: str, docs: Iterable[dict], keep_old: bool = False) -> str:
+    """Build a fresh index behind ``alias`` and swap it in atomically.
+
+    The new index is bulk-loaded with replicas and refresh disabled, then
+    restored to its serving settings, refreshed, and only then exposed
+    through the alias, so searches never see a half-built index.
+    """
+    index = begin_reindex(alias)
+    try:
+        feed_index(index, docs)
+    except Exception:
+        abort_reindex(index)
+        raise
+    return finish_reindex(alias, index, keep_old=keep_old)
+
+
+def begin_reindex(alias: str) -> str:
+    """Create the next build for ``alias``, tuned for bulk loading."""
+    index = new_index_name(alias)
+    get_client().indices.create(
+        index=index, body=index_body(replicas=0, refresh_interval="-1")
+    )
+    return index
+
+
+def doc_id(system: str, code: str) -> str:
+    return f"{system}|{code}"
+
+
+def feed_index(index: str, docs: Iterable[dict]) -> int:
+    # Deterministic ids make re-feeding a document an overwrite, not a copy
+    return run_bulk(
+        {"_index": index, "_id": doc_id(d["system"], d["code"]), "_source": d}
+        for d in docs
+    )
+
+
+def apply_delta(
+    alias: str, upserts: Iterable[dict], deletes: Iterable[tuple[str, str]]
+) -> None:
+    """Index/replace ``upserts`` and drop ``(system, code)`` pairs in place."""
+    feed_index(alias, upserts)
+    run_bulk(
+        (
+            {"_op_type": "delete", "_index": alias, "_id": doc_id(system, code)}
+            for system, code in deletes
+        ),
+        ignore_status=(404,),
+    )
+
+
+def alias_exists(alias: str) -> bool:
+    return bool(get_client().indices.exists_alias(name=alias))
+
+
+def abort_reindex(index: str) -> None:
+    """Best-effort cleanup of an unfinished build."""
+    try:
+        get_client().indices.delete(index=index, ignore_unavailable=True)
+    except Exception:
+        pass
+
+
+def finish_reindex(alias: str, index: str, keep_old: bool = False) -> str:
     es = get_client()
-    query = {
-        "size": size,
-        "query": {
-            "multi_match": {
-                "query": term,
-                "type": "bool_prefix",
-                "fields": [
-                    "display^3",
-                    "display._2gram",
-                    "display._3gram",
-                    "synonyms^2",
+    try:
+        es.indices.put_settings(
+            index=index,
+            body={
+                "index": {
+                    "number_of_replicas": get_settings().search_index_replicas,
+                    "refresh_interval": "1s",
+                }
+            },
+        )
+        es.indices.refresh(index=index)
+    except Exception:
+        abort_reindex(index)
+        raise
+
+    old = _concrete_indices(es, alias)
+    actions: list[dict] = [{"remove": {"index": i, "alias": alias}} for i in old]
+    if not old and es.indices.exists(index=alias):
+        # Pre-alias deployments used a concrete index named like the alias
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index, "alias": alias}})
+    es.indices.update_aliases(body={"actions": actions})
+    if not keep_old:
+        for i in old:
+            es.indices.delete(index=i, ignore_unavailable=True)
+    return index
+
+
+def _autocomplete_body(
+    term: str, size: int, system: str | None, alternatives: Iterable[str] = ()
+) -> dict:
+    fields = [
+        "display^3",
+        "display._2gram^3",
+        "display._3gram^3",
+        "synonyms^2",
+        "synonyms._2gram^2",
+        "synonyms._3gram^2",
+    ]
+    query: dict = {
+        "multi_match": {"query": term, "type": "bool_prefix", "fields": fields}
+    }
+    alternatives = list(alternatives)
+    if alternatives:
+        # Synonym expansions are matched as phrases and rank below the input
+        query = {
+            "bool": {
+                "should": [
+                    query,
+                    *(
+                        {
+                            "multi_match": {
+                                "query": alt,
+                                "type": "phrase",
+                                "fields": ["display", "synonyms"],
+                                "boost": 0.5,
+                            }
+                        }
+                        for alt in alternatives
+                    ),
                 ],
+                "minimum_should_match": 1,
             }
-        },
-    }
-    res = es.search(index=index, body=query)
+        }
+    if system:
+        query = {"bool": {"must": [query], "filter": [{"term": {"system": system}}]}}
+    return {"size": size, "query": query}
+
+
+def autocomplete(
+    index: str,
+    term: str,
+    size: int = 10,
+    system: str | None = None,
+    alternatives: Iterable[str] = (),
+) -> List[dict]:
+    es = get_client()
+    res = es.search(
+        index=index, body=_autocomplete_body(term, size, system, alternatives)
+    )
+    return [hit["_source"] for hit in res.get("hits", {}).get("hits", [])]
+
+
+async def autocomplete_async(
+    index: str,
+    term: str,
+    size: int = 10,
+    system: str | None = None,
+    alternatives: Iterable[str] = (),
+) -> List[dict]:
+    """Non-blocking autocomplete with a hard deadline and a circuit breaker.
+
+    Uses ``AsyncElasticsearch`` when the async extra is installed, otherwise
+    runs the sync client on a worker thread. Raises ``SearchUnavailable``
+    without calling ES while the breaker is open.
+    """
+    if not breaker.allow():
+        raise SearchUnavailable("Elasticsearch circuit open")
+    timeout = get_settings().search_timeout_seconds
+    body = _autocomplete_body(term, size, system, alternatives)
+    client = get_async_client()
+    try:
+        if client is not None:
+            call = client.search(index=index, body=body, request_timeout=timeout)
+        else:
+            call = asyncio.to_thread(
+                get_client().search, index=index, body=body, request_timeout=timeout
+            )
+        with track("elasticsearch", "autocomplete"):
+            res = await asyncio.wait_for(call, timeout)
+    except Exception:
+        breaker.record_failure()
+        raise
+    finally:
+        # A cancelled call must not keep the half-open probe taken
+        breaker.release()
+    breaker.record_success()
     return [hit["_source"] for hit in res.get("hits", {}).get("hits", [])]
@@ -0,0 +1,80 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+
+# Delete the lock only if we still own it
+_RELEASE_LUA = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one upstream call.
+
+    Within a process, callers for a key share one task. With ``redis`` set,
+    the task also takes a short ``SET NX`` lock so other workers wait for
+    the leader to populate the shared cache (read back via ``cache_get``)
+    instead of calling upstream themselves.
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        lock_ttl_ms: int = 15000,
+        wait_seconds: float = 10.0,
+        poll_seconds: float = 0.05,
+    ):
+        self.redis = redis
+        self.lock_ttl_ms = lock_ttl_ms
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        cache_get: Callable[[str], Awaitable[Any]] | None = None,
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._lead(key, fn, cache_get))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # Shield so one cancelled caller does not cancel the shared call
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, fn, cache_get) -> Any:
+        if not self.redis or cache_get is None:
+            return await fn()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(
+                lock_key, token, nx=True, px=self.lock_ttl_ms
+            )
+        except Exception:
+            return await fn()
+        if not acquired:
+            deadline = time.monotonic() + self.wait_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_seconds)
+                value = await cache_get(key)
+                if value is not None:
+                    return value
+                if not await self.redis.exists(lock_key):
+                    break
+            # Leader gave up or produced nothing cacheable; fetch ourselves
+            return await fn()
+        try:
+            return await fn()
+        finally:
+            try:
+                await self.redis.eval(_RELEASE_LUA, 1, lock_key, token)
+            except Exception:
+                pass
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from datetime import datetime
+from hashlib import sha256
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..db.models import SynonymSet
+from .ingest import normalize_term
+
+
+AYU_SAT = "ayu-sat"
+
+
+def compile_synonym_groups(syn_map: dict[str, list[str]]) -> list[list[str]]:
+    """Turn ``term -> synonyms`` into deduplicated groups of normalized terms."""
+    groups: list[list[str]] = []
+    seen: set[tuple[str, ...]] = set()
+    for term, syns in syn_map.items():
+        group = list(dict.fromkeys(t for t in map(normalize_term, [term, *syns]) if t))
+        key = tuple(group)
+        if len(group) > 1 and key not in seen:
+            seen.add(key)
+            groups.append(group)
+    return groups
+
+
+def groups_digest(groups: list[list[str]]) -> str:
+    return sha256(orjson.dumps(groups)).hexdigest()
+
+
+async def save_synonym_set(
+    session: AsyncSession, groups: list[list[str]], name: str = AYU_SAT
+) -> str:
+    digest = groups_digest(groups)
+    stmt = insert(SynonymSet).values(
+        name=name, digest=digest, groups=groups, updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SynonymSet.name],
+        set_={
+            "digest": stmt.excluded.digest,
+            "groups": stmt.excluded.groups,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await session.execute(stmt)
+    return digest
+
+
+class SynonymDictionary:
+    """Process-local normalized term -> synonym groups lookup.
+
+    Loaded from the compiled ``synonym_sets`` row; only its digest is polled
+    on refresh. A term may sit in several groups, and expansion returns the
+    union of those groups in compile order (groups are not merged
+    transitively).
+    """
+
+    def __init__(self, name: str = AYU_SAT, refresh_seconds: float = 300.0):
+        self.name = name
+        self.refresh_seconds = refresh_seconds
+        self.digest: str | None = None
+        self._groups: list[tuple[str, ...]] = []
+        self._terms: dict[str, list[int]] = {}
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def build(self, groups: list[list[str]], digest: str | None = None) -> None:
+        terms: dict[str, list[int]] = {}
+        for gid, group in enumerate(groups):
+            for term in group:
+                terms.setdefault(term, []).append(gid)
+        self._groups = [tuple(g) for g in groups]
+        self._terms = terms
+        self.digest = digest
+
+    def expand(self, text: str, limit: int | None = None) -> list[str]:
+        """Normalized synonyms of ``text`` (matched as a whole phrase)."""
+        norm = normalize_term(text)
+        out: dict[str, None] = {}
+        for gid in self._terms.get(norm, ()):
+            for term in self._groups[gid]:
+                if term != norm:
+                    out[term] = None
+        terms = list(out)
+        return terms[:limit] if limit is not None else terms
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._checked_at is not None
+            and time.monotonic() - self._checked_at < self.refresh_seconds
+        )
+
+    async def refresh(self, db: AsyncSession, force: bool = False) -> None:
+        if not force and self._is_fresh():
+            return
+        async with self._lock:
+            if not force and self._is_fresh():
+                return
+            res = await db.execute(
+                select(SynonymSet.digest).where(SynonymSet.name == self.name)
+            )
+            digest = res.scalar_one_or_none()
+            if digest is None:
+                self.build([])
+            elif digest != self.digest:
+                res = await db.execute(
+                    select(SynonymSet.groups).where(SynonymSet.name == self.name)
+                )
+                self.build(res.scalar_one(), digest)
+            self._checked_at = time.monotonic()
+
+
+synonym_dictionary = SynonymDictionary(
+    refresh_seconds=get_settings().concept_index_refresh_seconds
+)
@@ -0,0 +1,374 @@
+"""Load benchmark: realistic FHIR traffic against app.main:app with stand-ins.
+
+The app runs in-process (httpx ASGI transport, lifespan included) against
+the configured database, which must already hold the ingested ``data/``
+workbooks (``--seed-db`` runs the ingest first). The WHO ICD-API is
+replaced by a stub with canned search/autocode/codeinfo answers and a
+configurable latency. Search uses the in-memory engine and Redis is off
+unless ``--search-backend elasticsearch`` / ``--redis`` point at local
+instances. Rate limiting is disabled so the limiter does not shape the
+load.
+
+Virtual users loop over a weighted mix of ``$expand`` keystroke bursts,
+``$lookup``, ``$validate-code`` and ``$translate`` and the run is reported
+as JSON (throughput and p50/p95/p99 per operation). With ``--baseline``
+the report is compared against an earlier one and the exit status is 1 if
+any p95/p99 or the throughput regressed by more than ``--max-regression``.
+
+    poetry run python scripts/bench_load.py --duration 30 --concurrency 32 \\
+        --output bench.json [--baseline baseline.json]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+
+OPERATIONS = ("expand", "lookup", "validate-code", "translate")
+DEFAULT_MIX = "expand=60,lookup=15,validate-code=10,translate=15"
+ICD11_MMS = "http://id.who.int/icd/release/11/mms"
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    values = sorted(latencies)
+
+    def ms(v: float | None) -> float | None:
+        return None if v is None else round(v * 1000, 3)
+
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / seconds, 2) if seconds else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Regressions of ``report`` against ``baseline`` beyond the tolerance."""
+    problems = []
+    for op, current in report["operations"].items():
+        before = baseline.get("operations", {}).get(op)
+        if not before:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if before.get(key) and current.get(key):
+                change = current[key] / before[key] - 1
+                if change > max_regression:
+                    problems.append(
+                        f"{op} {key}: {before[key]} -> {current[key]} ({change:+.0%})"
+                    )
+    before_rps = baseline.get("overall", {}).get("throughput_rps")
+    if before_rps:
+        change = report["overall"]["throughput_rps"] / before_rps - 1
+        if change < -max_regression:
+            problems.append(
+                f"throughput: {before_rps} -> "
+                f"{report['overall']['throughput_rps']} rps ({change:+.0%})"
+            )
+    return problems
+
+
+class StubICD:
+    """Async httpx handler answering like the WHO ICD-API, after ``latency``."""
+
+    def __init__(self, latency: float, jitter: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    @staticmethod
+    def code_for(text: str) -> str:
+        n = int(hashlib.md5(text.encode()).hexdigest(), 16)
+        return f"S{chr(65 + n % 26)}{n % 90 + 10}"
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(
+            max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        )
+        path = request.url.path
+        params = request.url.params
+        if path.endswith("/autocode"):
+            text = params.get("searchText", "")
+            return httpx.Response(
+                200,
+                json={
+                    "searchText": text,
+                    "theCode": self.code_for(text),
+                    "matchingText": text,
+                    "matchScore": 0.8,
+                },
+            )
+        if path.endswith("/search"):
+            term = params.get("q", "")
+            return httpx.Response(
+                200,
+                json={
+                    "destinationEntities": [
+                        {"theCode": self.code_for(term), "title": term, "score": 0.8}
+                    ]
+                },
+            )
+        if "/codeinfo/" in path:
+            code = path.rsplit("/", 1)[-1]
+            return httpx.Response(200, json={"code": code, "stemId": f"stub/{code}"})
+        code = path.rsplit("/", 1)[-1]
+        return httpx.Response(
+            200, json={"code": code, "title": {"@value": f"Stub entity {code}"}}
+        )
+
+
+async def load_concepts(limit: int) -> list[tuple[str, str, str]]:
+    from sqlalchemy import select
+
+    from app.db.models import Concept
+    from app.db.session import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(
+            select(Concept.system, Concept.code, Concept.display)
+            .where(Concept.display.is_not(None))
+            .order_by(Concept.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in res.all()]
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, concepts: list, mix: dict):
+        self.client = client
+        self.concepts = concepts
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.latencies: dict[str, list[float]] = {op: [] for op in OPERATIONS}
+        self.errors: dict[str, int] = {op: 0 for op in OPERATIONS}
+
+    async def request(self, op: str, method: str, url: str, **kwargs) -> None:
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+            ok = resp.status_code < 400
+        except Exception:
+            ok = False
+        self.latencies[op].append(time.perf_counter() - start)
+        if not ok:
+            self.errors[op] += 1
+
+    async def expand_burst(self, rng: random.Random) -> None:
+        system, _, display = rng.choice(self.concepts)
+        # One request per keystroke, as an autocomplete widget would send
+        term = display[: rng.randint(4, 12)]
+        for i in range(2, len(term) + 1):
+            await self.request(
+                "expand",
+                "GET",
+                "/fhir/ValueSet/$expand",
+                params={"url": system, "filter": term[:i], "count": 10},
+            )
+
+    async def lookup(self, rng: random.Random) -> None:
+        system, code, _ = rng.choice(self.concepts)
+        if rng.random() < 0.3:
+            system, code = ICD11_MMS, StubICD.code_for(code)
+        await self.request(
+            "lookup",
+            "GET",
+            "/fhir/CodeSystem/$lookup",
+            params={"system": system, "code": code},
+        )
+
+    async def validate_code(self, rng: random.Random) -> None:
+        system, code, display = rng.choice(self.concepts)
+        await self.request(
+            "validate-code",
+            "GET",
+            "/fhir/CodeSystem/$validate-code",
+            params={"system": system, "code": code, "display": display},
+        )
+
+    async def translate(self, rng: random.Random) -> None:
+        system, code, _ = rng.choice(self.concepts)
+        params = {
+            "resourceType": "Parameters",
+            "parameter": [
+                {"name": "url", "valueUri": "http://namaste.ayush.gov.in/fhir/cm"},
+                {"name": "system", "valueUri": system},
+                {"name": "code", "valueCode": code},
+            ],
+        }
+        await self.request(
+            "translate", "POST", "/fhir/ConceptMap/$translate", json=params
+        )
+
+    async def user(self, rng: random.Random, deadline: float) -> None:
+        actions = {
+            "expand": self.expand_burst,
+            "lookup": self.lookup,
+            "validate-code": self.validate_code,
+            "translate": self.translate,
+        }
+        while time.perf_counter() < deadline:
+            await actions[rng.choices(self.ops, self.weights)[0]](rng)
+
+    def reset(self) -> None:
+        for op in OPERATIONS:
+            self.latencies[op].clear()
+            self.errors[op] = 0
+
+
+def configure_environment(args) -> None:
+    # Must run before app modules are imported: settings are read at import
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["SEARCH_BACKEND"] = args.search_backend
+    os.environ["REDIS_URL"] = args.redis or ""
+    os.environ["WHO_API_TOKEN"] = "bench"
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+
+async def run(args) -> dict:
+    if args.seed_db:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from ingest_local_data import ingest
+
+        await ingest()
+
+    from app.main import app
+    from app.security import create_access_token
+    from app.services.icd11 import icd_client
+
+    stub = StubICD(args.icd_latency_ms / 1000, args.icd_jitter_ms / 1000, args.seed)
+    await icd_client.aclose()
+    icd_client._transport = httpx.MockTransport(stub)
+
+    concepts = await load_concepts(args.sample)
+    if not concepts:
+        raise SystemExit("no concepts in the database; run with --seed-db")
+    token = create_access_token("bench-user")
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=60,
+        ) as client:
+            workload = Workload(client, concepts, parse_mix(args.mix))
+
+            async def phase(seconds: float) -> float:
+                start = time.perf_counter()
+                deadline = start + seconds
+                await asyncio.gather(
+                    *(
+                        workload.user(random.Random(args.seed + i), deadline)
+                        for i in range(args.concurrency)
+                    )
+                )
+                return time.perf_counter() - start
+
+            if args.warmup:
+                await phase(args.warmup)
+                workload.reset()
+            elapsed = await phase(args.duration)
+
+    all_latencies = [v for op in OPERATIONS for v in workload.latencies[op]]
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": parse_mix(args.mix),
+            "seed": args.seed,
+            "icd_latency_ms": args.icd_latency_ms,
+            "icd_jitter_ms": args.icd_jitter_ms,
+            "search_backend": args.search_backend,
+            "redis": bool(args.redis),
+            "concepts": len(concepts),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "icd_stub_calls": stub.calls,
+        "overall": summarize(all_latencies, sum(workload.errors.values()), elapsed),
+        "operations": {
+            op: summarize(workload.latencies[op], workload.errors[op], elapsed)
+            for op in OPERATIONS
+            if workload.latencies[op]
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="op=weight,...")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--sample", type=int, default=2000, help="Concepts drawn from the DB"
+    )
+    parser.add_argument("--icd-latency-ms", type=float, default=80.0)
+    parser.add_argument("--icd-jitter-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--search-backend", choices=("memory", "elasticsearch"), default="memory"
+    )
+    parser.add_argument("--redis", help="Redis URL (default: no Redis)")
+    parser.add_argument("--database-url", help="Overrides DATABASE_URL")
+    parser.add_argument(
+        "--seed-db", action="store_true", help="Ingest data/ before the run"
+    )
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        problems = compare(
+            report, json.loads(Path(args.baseline).read_text()), args.max_regression
+        )
+        for problem in problems:
+            print(f"[regression] {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
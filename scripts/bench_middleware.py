@@ -0,0 +1,108 @@
+"""Per-request middleware overhead: BaseHTTPMiddleware stack vs pure ASGI.
+
+Drives each app in-process through raw ASGI calls (no server, no client),
+so the difference is the middleware itself.
+
+    poetry run python scripts/bench_middleware.py [--requests N]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware import RequestContextMiddleware
+
+
+class LegacyRequestContextMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable):
+        request.state.request_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        response = await call_next(request)
+        duration = (time.perf_counter() - start) * 1000
+        response.headers["X-Request-ID"] = request.state.request_id
+        response.headers["X-Response-Time-ms"] = f"{duration:.2f}"
+        return response
+
+
+class LegacyPassthroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable):
+        return await call_next(request)
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"id": getattr(request.state, "request_id", None)}
+
+    if stack == "base":
+        # The previous stack: context + two no-op BaseHTTPMiddleware layers
+        app.add_middleware(LegacyRequestContextMiddleware)
+        app.add_middleware(LegacyPassthroughMiddleware)
+        app.add_middleware(LegacyPassthroughMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def call(app: FastAPI) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+
+    await app(scope, receive, send)
+
+
+async def measure(app: FastAPI, requests: int) -> float:
+    for _ in range(min(200, requests)):
+        await call(app)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int) -> None:
+    results = {
+        stack: await measure(build_app(stack), requests)
+        for stack in ("none", "base", "asgi")
+    }
+    for stack, us in results.items():
+        overhead = us - results["none"]
+        print(f"{stack:>5}: {us:8.1f} us/request  (middleware {overhead:+7.1f} us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
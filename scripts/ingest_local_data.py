@@ -1,92 +1,335 @@
+import argparse
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from typing import Iterable, Iterator
 
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import select
+from sqlalchemy import delete, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.models import AuditLog, CodeSystem, Base, Mapping
+from app.db.models import (
+    AutocodeCheckpoint,
+    Base,
+    CodeSystem,
+    Concept,
+    IngestSource,
+    Mapping,
+    SynonymSet,
+)
 from app.db.session import AsyncSessionLocal, engine
-from app.services.ingest import build_codesystem, load_namaste_codes
-from app.services.ingest import load_ayu_synonyms
-from app.services.search import bulk_index
+from app.services.ingest import build_codesystem, bump_version, chunked
+from app.services.ingest import concept_hash, concept_rows, diff_concepts, file_hash
+from app.services.ingest import load_namaste_codes, load_synonym_table
+from app.services.ingest import merge_synonyms, synonym_tables
+from app.services.renditions import store_renditions
+from app.services.synonyms import (
+    AYU_SAT,
+    SynonymDictionary,
+    compile_synonym_groups,
+    save_synonym_set,
+)
+from app.services.search import (
+    abort_reindex,
+    alias_exists,
+    apply_delta,
+    begin_reindex,
+    feed_index,
+    finish_reindex,
+)
 from app.config import get_settings
 
 
 DATA_DIR = Path("data")
+# asyncpg caps a statement at 32767 bind parameters
+CONCEPT_CHUNK_SIZE = 1000
+SOURCES = [
+    (
+        "namaste-ayurveda",
+        DATA_DIR / "Morbidity_Codes_Ayurveda.xls",
+        "https://namaste.ayush.gov.in/fhir/CodeSystem/ayurveda",
+        "NAMASTE Ayurveda Morbidity Codes",
+    ),
+    (
+        "namaste-siddha",
+        DATA_DIR / "Morbidity_Codes_Siddha.xls",
+        "https://namaste.ayush.gov.in/fhir/CodeSystem/siddha",
+        "NAMASTE Siddha Morbidity Codes",
+    ),
+    (
+        "namaste-unani",
+        DATA_DIR / "Morbidity_Codes_Unani.xls",
+        "https://namaste.ayush.gov.in/fhir/CodeSystem/unani",
+        "NAMASTE Unani Morbidity Codes",
+    ),
+]
 
 
 async def init_db():
     async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         await conn.run_sync(Base.metadata.create_all)
 
 
-async def ingest():
+async def upsert_concepts(session: AsyncSession, rows: list[dict]):
+    for chunk in chunked(rows, CONCEPT_CHUNK_SIZE):
+        stmt = insert(Concept).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Concept.system, Concept.code],
+            set_={
+                "display": stmt.excluded.display,
+                "definition": stmt.excluded.definition,
+                "normalized_display": stmt.excluded.normalized_display,
+                "synonyms": stmt.excluded.synonyms,
+            },
+        )
+        await session.execute(stmt)
+
+
+async def retire_concepts(session: AsyncSession, system: str, codes: list[str]):
+    for chunk in chunked(codes, CONCEPT_CHUNK_SIZE):
+        await session.execute(
+            delete(Concept).where(Concept.system == system, Concept.code.in_(chunk))
+        )
+        await session.execute(
+            delete(Mapping).where(
+                Mapping.source_system == system,
+                Mapping.source_code.in_(chunk),
+                Mapping.origin == "autocode",
+            )
+        )
+        await session.execute(
+            delete(AutocodeCheckpoint).where(
+                AutocodeCheckpoint.source_system == system,
+                AutocodeCheckpoint.source_code.in_(chunk),
+            )
+        )
+
+
+async def stored_concept_hashes(session: AsyncSession, system: str) -> dict[str, str]:
+    res = await session.execute(
+        select(
+            Concept.code, Concept.display, Concept.definition, Concept.synonyms
+        ).where(Concept.system == system)
+    )
+    return {
+        code: concept_hash(
+            {"display": display, "definition": definition, "synonyms": synonyms}
+        )
+        for code, display, definition, synonyms in res.all()
+    }
+
+
+async def save_codesystem(
+    session: AsyncSession,
+    cs_id: str,
+    url: str,
+    title: str,
+    concepts: list[dict],
+    changed: bool,
+) -> str:
+    """Insert the CodeSystem, or replace it under a bumped version if changed."""
+    row = (
+        await session.execute(select(CodeSystem).where(CodeSystem.cs_id == cs_id))
+    ).scalar_one_or_none()
+    if row is not None and not changed:
+        return row.version
+    version = bump_version(row.version) if row is not None else "1.0.0"
+    cs = build_codesystem(cs_id, url, title, concepts, version=version)
+    content = cs.dict(exclude_none=True)
+    stmt = insert(CodeSystem).values(
+        cs_id=cs_id,
+        url=url,
+        version=cs.version,
+        name=cs.name,
+        title=cs.title,
+        status=cs.status,
+        content=content,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CodeSystem.cs_id],
+        set_={
+            col: getattr(stmt.excluded, col)
+            for col in ("url", "version", "name", "title", "status", "content")
+        },
+    )
+    await session.execute(stmt)
+    await store_renditions(session, cs_id, version, content)
+    return version
+
+
+async def stored_source_hashes(session: AsyncSession) -> dict[str, str]:
+    res = await session.execute(select(IngestSource.name, IngestSource.sha256))
+    return dict(res.all())
+
+
+async def record_sources(session: AsyncSession, hashes: dict[str, str]):
+    if not hashes:
+        return
+    stmt = insert(IngestSource).values(
+        [
+            {"name": name, "sha256": digest, "updated_at": datetime.utcnow()}
+            for name, digest in hashes.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IngestSource.name],
+        set_={"sha256": stmt.excluded.sha256, "updated_at": stmt.excluded.updated_at},
+    )
+    await session.execute(stmt)
+
+
+def search_docs(rows: Iterable[dict]) -> Iterator[dict]:
+    for r in rows:
+        yield {
+            "system": r["system"],
+            "code": r["code"],
+            "display": r["display"],
+            "synonyms": r["synonyms"],
+        }
+
+
+async def ingest(workers: int | None = None, full: bool = False):
     await init_db()
     settings = get_settings()
-    files = [
-        (
-            "namaste-ayurveda",
-            DATA_DIR / "Morbidity_Codes_Ayurveda.xls",
-            "https://namaste.ayush.gov.in/fhir/CodeSystem/ayurveda",
-            "NAMASTE Ayurveda Morbidity Codes",
-        ),
-        (
-            "namaste-siddha",
-            DATA_DIR / "Morbidity_Codes_Siddha.xls",
-            "https://namaste.ayush.gov.in/fhir/CodeSystem/siddha",
-            "NAMASTE Siddha Morbidity Codes",
-        ),
-        (
-            "namaste-unani",
-            DATA_DIR / "Morbidity_Codes_Unani.xls",
-            "https://namaste.ayush.gov.in/fhir/CodeSystem/unani",
-            "NAMASTE Unani Morbidity Codes",
-        ),
-    ]
-    synonyms_map = load_ayu_synonyms(DATA_DIR)
-    search_docs: list[dict] = []
+    alias = settings.search_index_name
+    sources = [s for s in SOURCES if s[1].exists()]
+    tables = synonym_tables(DATA_DIR)
+    hashes = {p.name: file_hash(p) for p in [s[1] for s in sources] + tables}
     async with AsyncSessionLocal() as session:
-        for cs_id, path, url, title in files:
-            if not path.exists():
-                continue
-            concepts = load_namaste_codes(path)
-            cs = build_codesystem(cs_id, url, title, concepts)
-            stmt = (
-                insert(CodeSystem)
-                .values(
-                    cs_id=cs_id,
-                    url=url,
-                    version=cs.version,
-                    name=cs.name,
-                    title=cs.title,
-                    status=cs.status,
-                    content=cs.dict(exclude_none=True),
-                )
-                .on_conflict_do_nothing(index_elements=[CodeSystem.cs_id])
+        stored = await stored_source_hashes(session)
+        stored_groups = (
+            await session.execute(
+                select(SynonymSet.groups).where(SynonymSet.name == AYU_SAT)
+            )
+        ).scalar_one_or_none()
+
+    rebuild_index = full or not stored
+    if not rebuild_index:
+        try:
+            rebuild_index = not alias_exists(alias)
+        except Exception as e:
+            print(f"[warn] search index unreachable: {e}")
+    # Synonyms are folded into every concept row, so any table change
+    # touches every source
+    reparse_synonyms = (
+        full
+        or stored_groups is None
+        or any(hashes[p.name] != stored.get(p.name) for p in tables)
+    )
+    todo = [
+        s
+        for s in sources
+        if rebuild_index
+        or reparse_synonyms
+        or hashes[s[1].name] != stored.get(s[1].name)
+    ]
+    if not todo:
+        print("[info] sources unchanged; nothing to ingest")
+        return
+
+    loop = asyncio.get_running_loop()
+    # Workbooks are parsed in worker processes; each source is diffed against
+    # the DB and its delta applied as soon as it is parsed, then dropped
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Unchanged tables are not reparsed: their compiled groups are stored
+        synonym_jobs = [
+            loop.run_in_executor(pool, load_synonym_table, p)
+            for p in (tables if reparse_synonyms else [])
+        ]
+
+        async def parse(source):
+            return source, await loop.run_in_executor(
+                pool, load_namaste_codes, source[1]
             )
-            await session.execute(stmt)
-            # prepare ES docs
-            for c in concepts:
-                search_docs.append(
-                    {
-                        "system": url,
-                        "code": c.get("code"),
-                        "display": c.get("display"),
-                        "synonyms": synonyms_map.get(
-                            str(c.get("display", "")).lower(), []
-                        ),
-                    }
+
+        code_jobs = [asyncio.ensure_future(parse(s)) for s in todo]
+        if reparse_synonyms:
+            synonyms_map: dict[str, list[str]] = {}
+            for table in await asyncio.gather(*synonym_jobs):
+                merge_synonyms(synonyms_map, table)
+            synonym_groups = compile_synonym_groups(synonyms_map)
+        else:
+            synonym_groups = stored_groups
+        synonyms = SynonymDictionary()
+        synonyms.build(synonym_groups)
+
+        index = None
+        if rebuild_index:
+            try:
+                index = begin_reindex(alias)
+            except Exception as e:
+                print(f"[warn] indexing skipped: {e}")
+
+        async with AsyncSessionLocal() as session:
+            for job in asyncio.as_completed(code_jobs):
+                (cs_id, path, url, title), concepts = await job
+                rows = concept_rows(url, concepts, synonyms.expand)
+                existing = await stored_concept_hashes(session, url)
+                added, changed, retired = diff_concepts(existing, rows)
+                await upsert_concepts(session, added + changed)
+                await retire_concepts(session, url, retired)
+                version = await save_codesystem(
+                    session,
+                    cs_id,
+                    url,
+                    title,
+                    concepts,
+                    changed=bool(added or changed or retired),
+                )
+                await record_sources(session, {path.name: hashes[path.name]})
+                await session.commit()
+                print(
+                    f"[info] {cs_id}: {len(added)} added, {len(changed)} changed, "
+                    f"{len(retired)} retired (version {version})"
                 )
+                if index:
+                    try:
+                        feed_index(index, search_docs(rows))
+                    except Exception as e:
+                        print(f"[warn] indexing skipped: {e}")
+                        abort_reindex(index)
+                        index = None
+                elif not rebuild_index and (added or changed or retired):
+                    try:
+                        apply_delta(
+                            alias,
+                            search_docs(added + changed),
+                            ((url, code) for code in retired),
+                        )
+                    except Exception as e:
+                        print(
+                            f"[warn] search index not updated: {e}; "
+                            "re-run with --full once Elasticsearch is reachable"
+                        )
+            # Tables are recorded last so an interrupted run re-derives
+            # synonyms for every source next time
+            if reparse_synonyms:
+                await save_synonym_set(session, synonym_groups)
+            await record_sources(session, {p.name: hashes[p.name] for p in tables})
+            await session.commit()
         # ICD-10 crosswalk ingestion removed; rely on ICD-11 API at translate time
-        await session.commit()
-    # Index to Elasticsearch (if available)
-    if search_docs:
+    if index:
         try:
-            bulk_index(settings.search_index_name, search_docs)
+            finish_reindex(alias, index)
         except Exception as e:
             print(f"[warn] indexing skipped: {e}")
 
 
 if __name__ == "__main__":
-    asyncio.run(ingest())
+    parser = argparse.ArgumentParser(
+        description="Ingest local NAMASTE workbooks into the DB and search index"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes used to parse workbooks (defaults to CPU count)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reparse every source and rebuild the search index from scratch",
+    )
+    args = parser.parse_args()
+    asyncio.run(ingest(args.workers, args.full))
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+
+from app.config import get_settings
+from app.db.models import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.services.icd11 import icd_client
+from app.services.mapping_job import precompute_mappings
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def run(args):
+    base = get_settings().who_api_base.rstrip("/")
+    if args.release and not base.endswith(f"/{args.release}"):
+        # Autocode always queries WHO_API_BASE; --release only tags the rows
+        print(f"[warn] WHO_API_BASE ({base}) does not look like release {args.release}")
+    await init_db()
+    try:
+        stats = await precompute_mappings(
+            AsyncSessionLocal,
+            release_id=args.release,
+            systems=args.system or None,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+        )
+    finally:
+        await icd_client.aclose()
+    print(
+        f"[info] processed {stats['processed']} concepts, "
+        f"{stats['matched']} matched, {stats['failed']} failed (retry on next run)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute NAMASTE -> ICD-11 mappings via WHO autocode"
+    )
+    parser.add_argument("--system", action="append", help="Limit to a system URL")
+    parser.add_argument(
+        "--release",
+        help="Release id to tag rows with (defaults to WHO_RELEASE_ID; "
+        "WHO_API_BASE must point at the same release)",
+    )
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--batch-size", type=int)
+    asyncio.run(run(parser.parse_args()))
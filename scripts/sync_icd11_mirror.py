@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+
+from app.db.models import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.services.icd11 import icd_client
+from app.services.icd11_mirror import sync_linearization
+from app.config import get_settings
+
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def sync(linearizations: list[str], release_id: str | None):
+    await init_db()
+    release_id = release_id or get_settings().who_release_id
+    try:
+        async with AsyncSessionLocal() as session:
+            for lin in linearizations:
+                total = await sync_linearization(session, lin, release_id=release_id)
+                print(
+                    f"[info] mirrored {total} {lin} entities for release {release_id}"
+                )
+    finally:
+        await icd_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mirror ICD-11 linearizations from the WHO ICD-API into the DB"
+    )
+    parser.add_argument("linearizations", nargs="*", default=["mms"])
+    parser.add_argument(
+        "--release",
+        help="Release id to tag rows with (defaults to WHO_RELEASE_ID; "
+        "WHO_API_BASE must point at the same release)",
+    )
+    args = parser.parse_args()
+    asyncio.run(sync(args.linearizations, args.release))
@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services import audit
+from app.services.audit import AuditWriter
+
+
+class FakeInsert:
+    def __init__(self, table):
+        self.rows = []
+
+    def values(self, rows):
+        self.rows = rows
+        return self
+
+
+@pytest.fixture(autouse=True)
+def fake_insert(monkeypatch):
+    monkeypatch.setattr(audit, "insert", FakeInsert)
+
+
+class FakeSession:
+    def __init__(self, batches, fail):
+        self.batches = batches
+        self.fail = fail
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        if self.fail:
+            raise ConnectionError("db down")
+        self.batches.append(len(stmt.rows))
+
+    async def commit(self):
+        pass
+
+
+def factory(batches, fail=lambda: False):
+    return lambda: FakeSession(batches, fail())
+
+
+def event(n: int) -> dict:
+    return {
+        "request_id": str(n),
+        "user_sub": None,
+        "action": "expand",
+        "resource": "ValueSet",
+        "path": "/fhir/ValueSet/$expand",
+        "method": "GET",
+        "status_code": 200,
+        "details": None,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def test_events_are_written_in_batches_and_flushed_on_stop():
+    batches: list[int] = []
+
+    async def run():
+        writer = AuditWriter(factory(batches), batch_size=4, flush_seconds=60)
+        writer.start()
+        for n in range(10):
+            await writer.record(event(n))
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert batches == [4, 4, 2]
+    assert writer.stats()["written"] == 10
+
+
+def test_full_queue_drops_or_spills_and_spill_is_replayed(tmp_path):
+    spill = tmp_path / "audit.jsonl"
+    batches: list[int] = []
+    db_up = False
+
+    async def fill(policy):
+        writer = AuditWriter(
+            factory(batches, lambda: not db_up),
+            max_events=2,
+            policy=policy,
+            spill_path=spill if policy == "spill" else None,
+        )
+        writer.start()
+        for n in range(5):
+            await writer.record(event(n))
+        return writer
+
+    async def run():
+        nonlocal db_up
+        dropping = await fill("drop")
+        assert dropping.dropped == 3
+        await dropping.stop()
+
+        spilling = await fill("spill")
+        assert spilling.spilled >= 1 and spilling.dropped == 0
+        await spilling.stop()
+        # Batches rejected by the DB are spilled as well
+        assert len(spill.read_bytes().splitlines()) == 5
+
+        db_up = True
+        replaying = AuditWriter(factory(batches), spill_path=spill)
+        replaying.start()
+        await replaying.stop()
+        return replaying
+
+    assert asyncio.run(run()).written == 5
+    assert not spill.exists()
+
+
+def test_leftover_replay_file_is_replayed_and_failed_replay_keeps_writer(tmp_path):
+    spill = tmp_path / "audit.jsonl"
+    leftover = tmp_path / "audit.jsonl.replay"
+    batches: list[int] = []
+
+    async def run():
+        # A replay that crashed left its file behind; new events spilled since
+        await AuditWriter(factory(batches), spill_path=leftover)._spill([event(0)])
+        await AuditWriter(factory(batches), spill_path=spill)._spill([event(1)])
+
+        writer = AuditWriter(factory(batches), spill_path=spill)
+        writer.start()
+        await writer.stop()
+        assert writer.written == 2
+        assert not leftover.exists() and not spill.exists()
+
+        leftover.write_bytes(b"not json\n")
+        writer = AuditWriter(factory(batches), spill_path=spill)
+        writer.start()
+        await writer.record(event(3))
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.written == 1
+    assert leftover.exists()
@@ -0,0 +1,33 @@
+from app.services.autocomplete import AutocompleteEngine
+
+
+DOCS = [
+    {"system": "ayu", "code": "A1", "display": "Vata fever", "synonyms": []},
+    {"system": "ayu", "code": "A2", "display": "Fever due to Vata", "synonyms": []},
+    {"system": "sid", "code": "S1", "display": "Headache", "synonyms": ["Vatam"]},
+    {"system": "ayu", "code": "A3", "display": "Kapha cough", "synonyms": []},
+]
+
+
+def build() -> AutocompleteEngine:
+    engine = AutocompleteEngine()
+    engine.build(DOCS)
+    return engine
+
+
+def test_prefix_match_ranks_display_and_position():
+    codes = [d["code"] for d in build().search("vat")]
+    # Display at position 0, then display at a later position, then synonym
+    assert codes == ["A1", "A2", "S1"]
+
+
+def test_all_query_tokens_must_match():
+    assert [d["code"] for d in build().search("fev vat")] == ["A1", "A2"]
+    assert build().search("fever kapha") == []
+
+
+def test_system_filter_and_size():
+    engine = build()
+    assert [d["code"] for d in engine.search("vat", system="sid")] == ["S1"]
+    assert len(engine.search("vat", size=1)) == 1
+    assert engine.search("   ") == []
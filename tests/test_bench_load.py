@@ -0,0 +1,53 @@
+import pytest
+
+from scripts.bench_load import compare, parse_mix, percentile
+
+
+def report(rps: float, **operations) -> dict:
+    return {"operations": operations, "overall": {"throughput_rps": rps}}
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 11)]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 95) == 10.0
+    assert percentile(values, 91) == 10.0
+    assert percentile(values, 90) == 9.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([], 95) is None
+
+
+def test_parse_mix_rejects_unknown_operations():
+    assert parse_mix("expand=60, lookup=40") == {"expand": 60.0, "lookup": 40.0}
+    with pytest.raises(SystemExit):
+        parse_mix("expand=60,search=40")
+
+
+def test_latency_rise_beyond_tolerance_is_a_regression():
+    baseline = report(100.0, expand={"p95_ms": 10.0, "p99_ms": 20.0})
+    within = report(100.0, expand={"p95_ms": 11.0, "p99_ms": 22.0})
+    assert compare(within, baseline, max_regression=0.2) == []
+
+    slower = report(100.0, expand={"p95_ms": 11.0, "p99_ms": 30.0})
+    problems = compare(slower, baseline, max_regression=0.2)
+    assert len(problems) == 1
+    assert problems[0].startswith("expand p99_ms")
+
+
+def test_throughput_drop_beyond_tolerance_is_a_regression():
+    baseline = report(100.0)
+    assert compare(report(85.0), baseline, max_regression=0.2) == []
+    assert compare(report(120.0), baseline, max_regression=0.2) == []
+    problems = compare(report(70.0), baseline, max_regression=0.2)
+    assert len(problems) == 1
+    assert problems[0].startswith("throughput")
+
+
+def test_operations_missing_from_the_baseline_are_skipped():
+    baseline = report(100.0, expand={"p95_ms": 10.0, "p99_ms": 20.0})
+    current = report(
+        100.0,
+        expand={"p95_ms": 10.0, "p99_ms": 20.0},
+        translate={"p95_ms": 500.0, "p99_ms": 900.0},
+    )
+    assert compare(current, baseline, max_regression=0.2) == []
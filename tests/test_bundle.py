@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.fhir import endpoints
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    calls = {"routes": [], "active": 0, "peak": 0}
+
+    async def track(route: str, delay: float = 0.0):
+        calls["routes"].append(route)
+        calls["active"] += 1
+        calls["peak"] = max(calls["peak"], calls["active"])
+        await asyncio.sleep(delay)
+        calls["active"] -= 1
+
+    async def lookup(system, code, user=None, db=None):
+        # Later entries finish first, so ordering must not follow completion
+        await track("lookup", 0.05 / (1 + int(code)))
+        return {"resourceType": "Parameters", "code": code}
+
+    async def validate(system, code, display=None, user=None, db=None):
+        await track("validate-code")
+        raise HTTPException(status_code=404, detail="Code not found")
+
+    async def translate(resource, user=None, db=None):
+        await track("translate")
+        raise RuntimeError("boom")
+
+    async def read(cs_id, **kwargs):
+        await track("read")
+        return {"resourceType": "CodeSystem", "id": cs_id, "count": kwargs["count"]}
+
+    monkeypatch.setattr(endpoints, "AsyncSessionLocal", FakeSession)
+    monkeypatch.setattr(endpoints, "codesystem_lookup", lookup)
+    monkeypatch.setattr(endpoints, "validate_code", validate)
+    monkeypatch.setattr(endpoints, "conceptmap_translate", translate)
+    monkeypatch.setattr(endpoints, "get_codesystem", read)
+    return calls
+
+
+def entry(method: str, url: str, resource: dict | None = None) -> dict:
+    out = {"request": {"method": method, "url": url}}
+    if resource:
+        out["resource"] = resource
+    return out
+
+
+def post(entries: list[dict], type_: str = "batch") -> dict:
+    bundle = {"resourceType": "Bundle", "type": type_, "entry": entries}
+    return asyncio.run(endpoints.post_bundle(None, bundle, None))
+
+
+PARAMS = {"resourceType": "Parameters", "parameter": []}
+
+
+def test_entries_are_routed_and_errors_become_operation_outcomes(handlers):
+    out = post(
+        [
+            entry("GET", "CodeSystem/$lookup?system=s&code=1"),
+            entry("GET", "/fhir/CodeSystem/$validate-code?system=s&code=2"),
+            entry("POST", "ConceptMap/$translate", PARAMS),
+            entry("GET", "CodeSystem/namaste-ayurveda?_count=5"),
+            entry("GET", "CodeSystem/$lookup?system=s"),
+            entry("DELETE", "CodeSystem/x"),
+        ]
+    )
+    assert out["type"] == "batch-response"
+    statuses = [e["response"]["status"] for e in out["entry"]]
+    assert statuses == [
+        "200 OK",
+        "404 Not Found",
+        "500 Internal Server Error",
+        "200 OK",
+        "400 Bad Request",
+        "400 Bad Request",
+    ]
+    assert out["entry"][0]["resource"]["code"] == "1"
+    assert out["entry"][3]["resource"] == {
+        "resourceType": "CodeSystem",
+        "id": "namaste-ayurveda",
+        "count": 5,
+    }
+    for failed in out["entry"][1:3] + out["entry"][4:]:
+        assert failed["resource"]["resourceType"] == "OperationOutcome"
+    assert "Missing code" in out["entry"][4]["resource"]["issue"][0]["diagnostics"]
+    assert sorted(set(handlers["routes"])) == [
+        "lookup",
+        "read",
+        "translate",
+        "validate-code",
+    ]
+
+
+def test_responses_keep_request_order_under_bounded_concurrency(monkeypatch, handlers):
+    monkeypatch.setattr(get_settings(), "bundle_concurrency", 3)
+    out = post(
+        [entry("GET", f"CodeSystem/$lookup?system=s&code={n}") for n in range(8)]
+    )
+    assert [e["resource"]["code"] for e in out["entry"]] == [str(n) for n in range(8)]
+    assert handlers["peak"] == 3
+
+
+def test_bundle_size_is_limited(monkeypatch, handlers):
+    monkeypatch.setattr(get_settings(), "bundle_max_entries", 2)
+    with pytest.raises(HTTPException) as exc:
+        post([entry("GET", f"CodeSystem/$lookup?system=s&code={n}") for n in range(3)])
+    assert exc.value.status_code == 400
+    assert handlers["routes"] == []
+
+
+def test_transaction_fails_as_a_whole(handlers):
+    ok = entry("GET", "CodeSystem/$lookup?system=s&code=1")
+    assert post([ok], "transaction")["type"] == "transaction-response"
+    with pytest.raises(HTTPException) as exc:
+        post(
+            [ok, entry("GET", "CodeSystem/$validate-code?system=s&code=2")],
+            "transaction",
+        )
+    assert exc.value.status_code == 404
+    assert exc.value.detail == "Code not found"
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from app.services.cache import LRUCache, TieredCache, decode, encode
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+def test_codec_roundtrip_and_legacy_json():
+    small = {"code": "1F40.Z"}
+    large = {"title": "x" * 5000}
+    assert decode(encode(small)) == small
+    assert decode(encode(large)) == large
+    assert len(encode(large)) < 200
+    assert decode(b'{"code": "1F40.Z"}') == small
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") == (False, None)
+
+
+def test_tiered_cache_promotes_redis_hits():
+    redis = FakeRedis()
+    cache = TieredCache(redis, LRUCache(10, 60))
+    asyncio.run(cache.set("k", {"v": 1}))
+    cache.l1.clear()
+    assert asyncio.run(cache.get("k")) == {"v": 1}
+    assert asyncio.run(cache.get("k")) == {"v": 1}
+    stats = cache.stats()
+    assert stats["l2"]["hits"] == 1
+    assert stats["l1"]["hits"] == 1
+
+
+def test_icd_entries_past_max_stale_are_misses(monkeypatch):
+    from app.services import icd11
+
+    now = time.time()
+    cached = {
+        "stale": {"value": "old", "fresh_until": now - 10},
+        "expired": {"value": "old", "fresh_until": now - 7200},
+    }
+    calls = []
+
+    async def cache_get(key):
+        return cached.get(key)
+
+    async def fetch():
+        calls.append(1)
+        return "new", None
+
+    monkeypatch.setattr(icd11, "_cache_get", cache_get)
+    monkeypatch.setattr(icd11, "_refresh_in_background", lambda key, fetch: None)
+    monkeypatch.setattr(icd11.settings, "icd_max_stale_seconds", 3600)
+
+    async def run():
+        return (
+            await icd11._cached_fetch("stale", fetch),
+            await icd11._cached_fetch("expired", fetch),
+        )
+
+    assert asyncio.run(run()) == ("old", "new")
+    assert calls == [1]
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker
+
+
+def test_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the half-open probe
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_cancelled_autocomplete_releases_the_probe(monkeypatch):
+    from app.services import search
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+    breaker.allow()
+    breaker.record_failure()
+
+    class HangingClient:
+        async def search(self, **kwargs):
+            await asyncio.sleep(60)
+
+    monkeypatch.setattr(search, "breaker", breaker)
+    monkeypatch.setattr(search, "get_async_client", lambda: HangingClient())
+
+    async def run():
+        task = asyncio.ensure_future(search.autocomplete_async("concepts", "vata"))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow()  # the probe is in flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
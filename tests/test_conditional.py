@@ -0,0 +1,70 @@
+from fastapi import Response
+from starlette.requests import Request
+
+from app.fhir.conditional import conditional, make_etag
+
+
+def request(if_none_match: str | None = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_etag_is_stable_and_input_sensitive():
+    assert make_etag("lookup", "A", "1.0.0") == make_etag("lookup", "A", "1.0.0")
+    assert make_etag("lookup", "A", "1.0.0") != make_etag("lookup", "A", "1.0.1")
+    assert make_etag("x", weak=True).startswith('W/"')
+
+
+def test_conditional_sets_validators_or_returns_304():
+    etag = make_etag("CodeSystem", "cs", 1, "1.0.0")
+    response = Response()
+    assert conditional(request(), response, etag) is None
+    assert response.headers["etag"] == etag
+    assert "max-age" in response.headers["cache-control"]
+
+    for header in (etag, f'"other", W/{etag}', "*"):
+        not_modified = conditional(request(header), Response(), etag)
+        assert not_modified.status_code == 304
+        assert not_modified.headers["etag"] == etag
+    assert conditional(request('"other"'), Response(), etag) is None
+    assert conditional(None, None, etag) is None
+
+
+def test_icd_validate_code_tags_outcome_and_skips_validators_on_errors(monkeypatch):
+    import asyncio
+
+    import app.services.icd11 as icd11
+    from app.fhir import endpoints
+
+    async def no_mirror(db, code, linearization):
+        return None
+
+    async def found(code, linearization="mms"):
+        return {"code": code, "title": {"@value": "Found"}}
+
+    async def missing(code, linearization="mms"):
+        return None
+
+    async def unavailable(code, linearization="mms"):
+        raise RuntimeError("WHO 503")
+
+    monkeypatch.setattr(endpoints, "mirror_lookup", no_mirror)
+
+    def validate(codeinfo):
+        monkeypatch.setattr(icd11, "codeinfo_icd11", codeinfo)
+        response = Response()
+        out = asyncio.run(
+            endpoints.validate_code(
+                endpoints.ICD11_MMS, "1A00", None, None, None, request(), response
+            )
+        )
+        return out, response.headers
+
+    ok, ok_headers = validate(found)
+    not_found, not_found_headers = validate(missing)
+    error, error_headers = validate(unavailable)
+    assert ok["parameter"][0]["valueBoolean"] is True
+    assert not_found["parameter"][0]["valueBoolean"] is False
+    assert ok_headers["etag"] != not_found_headers["etag"]
+    assert error["parameter"][0]["valueBoolean"] is False
+    assert "etag" not in error_headers and "cache-control" not in error_headers
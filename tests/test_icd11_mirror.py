@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+
+from app.services.icd11 import ICDClient
+from app.services.icd11_mirror import crawl_linearization
+
+
+BASE = "http://icd.stub/icd/release/11/2025-01"
+CANON = "http://id.who.int/icd/release/11/2025-01/mms"
+
+ENTITIES = {
+    "/icd/release/11/2025-01/mms": {"child": [f"{CANON}/1"]},
+    "/icd/release/11/2025-01/mms/1": {
+        "@id": f"{CANON}/1",
+        "title": {"@value": "Certain infectious or parasitic diseases"},
+        "classKind": "chapter",
+        "code": "01",
+        "parent": ["http://id.who.int/icd/release/11/2025-01/mms"],
+        "child": [f"{CANON}/2"],
+    },
+    "/icd/release/11/2025-01/mms/2": {
+        "@id": f"{CANON}/2",
+        "title": {"@value": "Cholera"},
+        "classKind": "category",
+        "code": "1A00",
+        "parent": [f"{CANON}/1"],
+        "synonym": [{"label": {"@value": "Asiatic cholera"}}],
+        "indexTerm": [{"label": {"@value": "Cholera"}}],
+    },
+}
+
+
+def stub_icd_api(request: httpx.Request) -> httpx.Response:
+    doc = ENTITIES.get(request.url.path)
+    return httpx.Response(200, json=doc) if doc else httpx.Response(404)
+
+
+def test_crawl_linearization_against_stub():
+    client = ICDClient(transport=httpx.MockTransport(stub_icd_api))
+
+    async def crawl():
+        rows = [
+            row async for row in crawl_linearization(client, "mms", "2025-01", BASE)
+        ]
+        await client.aclose()
+        return rows
+
+    rows = asyncio.run(crawl())
+    assert [r["code"] for r in rows] == ["01", "1A00"]
+    cholera = rows[1]
+    assert cholera["title"] == "Cholera"
+    assert cholera["normalized_title"] == "cholera"
+    assert cholera["parent_code"] == "01"
+    assert cholera["synonyms"] == ["Asiatic cholera"]
+    assert cholera["index_terms"] == ["Cholera"]
+    assert cholera["release_id"] == "2025-01"
+
+
+def test_title_matches_compare_normalized_terms_on_the_indexed_column():
+    from app.services.icd11_mirror import mirror_title_matches
+
+    statements = []
+
+    class FakeResult:
+        def scalars(self):
+            return []
+
+    class FakeSession:
+        async def execute(self, stmt):
+            statements.append(stmt)
+            return FakeResult()
+
+    asyncio.run(mirror_title_matches(FakeSession(), ["Vāta-Jvara", "vata jvara", ""]))
+    (stmt,) = statements
+    sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+    assert "icd11_entities.normalized_title IN ('vata jvara')" in sql
+    assert "lower(" not in sql
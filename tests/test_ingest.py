@@ -0,0 +1,71 @@
+from openpyxl import Workbook
+
+from app.services.ingest import (
+    bump_version,
+    chunked,
+    concept_hash,
+    concept_rows,
+    diff_concepts,
+    iter_namaste_codes,
+    load_synonym_table,
+)
+
+
+def write_xlsx(path, rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(row)
+    wb.save(path)
+
+
+def test_streams_namaste_codes_from_xlsx(tmp_path):
+    path = tmp_path / "codes.xlsx"
+    write_xlsx(
+        path,
+        [
+            ["Code", "Name English", "Definition"],
+            ["AB 1", "Vata fever", "Fever of vata origin"],
+            [None, None, None],
+            ["", "No code", None],
+            [123, None, None],
+        ],
+    )
+    assert list(iter_namaste_codes(path)) == [
+        {"code": "AB1", "display": "Vata fever", "definition": "Fever of vata origin"},
+        {"code": "123", "display": "123"},
+    ]
+
+
+def test_synonym_table_and_chunked(tmp_path):
+    path = tmp_path / "ayu-sat-table-x.xlsx"
+    write_xlsx(path, [["Term", "Synonyms"], ["Jvara", "Fever; Pyrexia|fever"]])
+    assert load_synonym_table(path) == {"jvara": ["Fever", "Pyrexia"]}
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_diff_concepts_and_version_bump():
+    old = concept_rows(
+        "sys",
+        [
+            {"code": "A", "display": "Alpha"},
+            {"code": "B", "display": "Beta"},
+            {"code": "C", "display": "Gamma"},
+        ],
+    )
+    new = concept_rows(
+        "sys",
+        [
+            {"code": "A", "display": "Alpha"},
+            {"code": "B", "display": "Beta", "definition": "second letter"},
+            {"code": "D", "display": "Delta"},
+        ],
+    )
+    added, changed, retired = diff_concepts(
+        {r["code"]: concept_hash(r) for r in old}, new
+    )
+    assert [r["code"] for r in added] == ["D"]
+    assert [r["code"] for r in changed] == ["B"]
+    assert retired == ["C"]
+    assert bump_version("1.0.0") == "1.0.1"
+    assert bump_version("2024-rc") == "2024-rc.1"
+    assert bump_version(None) == "1.0.0"
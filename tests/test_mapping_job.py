@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services import mapping_job
+from app.services.icd11 import ICD11_TM2
+from app.services.mapping_job import display_hash, precompute_mappings
+
+NAMASTE = "https://namaste.example/CodeSystem/namaste"
+
+
+class FakeInsert:
+    """Stands in for pg ``insert``; keeps the rows and the upsert columns."""
+
+    def __init__(self, table):
+        self.table = table.__tablename__
+        self.rows = []
+        self.upsert = None
+        self.excluded = self
+
+    def __getattr__(self, name):
+        return name
+
+    def values(self, rows):
+        self.rows = rows
+        return self
+
+    def on_conflict_do_update(self, index_elements, set_):
+        self.upsert = set(set_)
+        return self
+
+
+class FakeDB:
+    """Concepts plus the checkpoint and mapping tables, keyed like Postgres."""
+
+    def __init__(self, concepts):
+        self.concepts = {
+            cid: [system, code, display] for cid, system, code, display in concepts
+        }
+        self.checkpoints: dict[tuple, dict] = {}
+        self.mappings: list[dict] = []
+        self.pages: list[int] = []
+
+    def pending(self, release_id, after_id, limit, systems=None):
+        self.pages.append(after_id)
+        rows = []
+        for cid in sorted(self.concepts):
+            system, code, display = self.concepts[cid]
+            cp = self.checkpoints.get((system, code))
+            if cid > after_id and (
+                cp is None
+                or cp["release_id"] != release_id
+                or cp["display_hash"] != display_hash(display)
+            ):
+                rows.append((cid, system, code, display))
+        return rows[:limit]
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, db):
+        self.db = db
+        self.pending: list = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt):
+        if isinstance(stmt, list):
+            return FakeResult(stmt)
+        self.pending.append(stmt)
+
+    async def commit(self):
+        for stmt in self.pending:
+            if not isinstance(stmt, FakeInsert):
+                continue
+            if stmt.table == "mappings":
+                self.db.mappings.extend(stmt.rows)
+                continue
+            assert stmt.upsert == {
+                "display_hash",
+                "release_id",
+                "matched",
+                "updated_at",
+            }
+            for row in stmt.rows:
+                self.db.checkpoints[(row["source_system"], row["source_code"])] = row
+        self.pending = []
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB(
+        [
+            (10, NAMASTE, "A1", "Jwara"),
+            (25, NAMASTE, "A2", "Kasa"),
+            (31, NAMASTE, "A3", "Shvasa"),
+            (47, NAMASTE, "A4", "Atisara"),
+            (52, NAMASTE, "A5", "Kamala"),
+        ]
+    )
+    db.calls = []
+    db.failing = set()
+
+    async def autocode(text, release_id=None, raise_errors=False):
+        db.calls.append(text)
+        if text in db.failing:
+            raise ConnectionError("WHO down")
+        return {"theCode": f"X{len(db.calls)}", "matchingText": text}, ICD11_TM2
+
+    monkeypatch.setattr(mapping_job, "insert", FakeInsert)
+    monkeypatch.setattr(mapping_job, "_pending_concepts", db.pending)
+    monkeypatch.setattr(mapping_job, "autocode_best_effort", autocode)
+    return db
+
+
+def run(db, **kwargs):
+    return asyncio.run(
+        precompute_mappings(db.session, release_id="2025-01", batch_size=2, **kwargs)
+    )
+
+
+def test_pending_concepts_page_by_id_and_compare_display_hash():
+    sql = str(
+        mapping_job._pending_concepts("2025-01", 31, 2).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "concepts.id > " in sql
+    assert "ORDER BY concepts.id" in sql
+    assert "md5(concepts.display)" in sql
+    assert "LIMIT" in sql
+
+
+def test_pages_by_last_id_and_skips_unchanged_concepts(db):
+    stats = run(db)
+    assert stats == {"processed": 5, "matched": 5, "failed": 0}
+    # Keyset paging: each page starts after the last id of the previous one
+    assert db.pages == [0, 25, 47, 52]
+    assert len(db.checkpoints) == 5
+
+    db.calls.clear()
+    assert run(db)["processed"] == 0
+    assert db.calls == []
+
+    db.concepts[31][2] = "Tamaka shvasa"
+    assert run(db)["processed"] == 1
+    assert db.calls == ["Tamaka shvasa"]
+    assert db.checkpoints[(NAMASTE, "A3")]["display_hash"] == display_hash(
+        "Tamaka shvasa"
+    )
+
+
+def test_failed_concepts_get_no_checkpoint_and_are_retried(db):
+    db.failing = {"Kasa", "Kamala"}
+    stats = run(db)
+    assert stats == {"processed": 3, "matched": 3, "failed": 2}
+    assert set(db.checkpoints) == {(NAMASTE, "A1"), (NAMASTE, "A3"), (NAMASTE, "A4")}
+    assert {m["source_code"] for m in db.mappings} == {"A1", "A3", "A4"}
+
+    db.failing.clear()
+    db.calls.clear()
+    assert run(db)["processed"] == 2
+    assert sorted(db.calls) == ["Kamala", "Kasa"]
+    assert len(db.checkpoints) == 5
+    assert all(cp["matched"] for cp in db.checkpoints.values())
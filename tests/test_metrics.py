@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.middleware import MetricsMiddleware
+
+
+def sample(name: str, labels: dict) -> float:
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_operations_backends_and_caches_are_exported():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/fhir/ValueSet/$expand")
+    async def expand():
+        return {}
+
+    @metrics.timed("test-backend")
+    async def call():
+        return 1
+
+    labels = {"operation": "expand"}
+    before = sample("fhir_operation_duration_seconds_count", labels)
+    TestClient(app).get("/fhir/ValueSet/$expand")
+    assert sample("fhir_operation_duration_seconds_count", labels) == before + 1
+    assert sample(
+        "fhir_operation_responses_total", {"operation": "expand", "status": "200"}
+    )
+
+    asyncio.run(call())
+    assert sample(
+        "backend_call_duration_seconds_count",
+        {"backend": "test-backend", "call": "call"},
+    )
+
+    metrics.register_cache("test", lambda: {"hits": 3, "misses": 1})
+    try:
+        body, _ = metrics.render()
+    finally:
+        metrics._cache_stats.pop("test")
+    assert b'cache_requests_total{cache="test",result="hit"} 3.0' in body
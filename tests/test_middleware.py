@@ -0,0 +1,18 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware import RequestContextMiddleware
+
+
+def test_request_context_headers_match_request_state():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"id": request.state.request_id}
+
+    resp = TestClient(app).get("/ping")
+    assert resp.status_code == 200
+    assert resp.headers["x-request-id"] == resp.json()["id"]
+    assert float(resp.headers["x-response-time-ms"]) >= 0
@@ -0,0 +1,53 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware import RateLimitMiddleware, route_class
+from app.services.ratelimit import LocalBuckets, RateLimiter
+
+
+class DownRedis:
+    def register_script(self, script):
+        async def call(keys, args):
+            raise ConnectionError("redis down")
+
+        return call
+
+
+def test_local_bucket_allows_burst_then_refuses():
+    buckets = LocalBuckets()
+    assert all(buckets.take("k", 3, 0.001)[0] for _ in range(3))
+    allowed, tokens = buckets.take("k", 3, 0.001)
+    assert not allowed and tokens < 1
+
+
+def test_unreachable_redis_falls_back_to_local_buckets():
+    limiter = RateLimiter(DownRedis())
+    decisions = [asyncio.run(limiter.hit("k", 2, 0.5)) for _ in range(3)]
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert decisions[-1].retry_after == 2
+    assert ("Retry-After", "2") in decisions[-1].headers()
+
+
+def test_middleware_limits_per_route_class():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter())
+
+    @app.get("/fhir/CodeSystem/x")
+    async def read():
+        return {}
+
+    @app.get("/healthz")
+    async def healthz():
+        return {}
+
+    client = TestClient(app)
+    statuses = [client.get("/fhir/CodeSystem/x").status_code for _ in range(51)]
+    assert statuses.count(200) == 50 and statuses[-1] == 429
+    resp = client.get("/fhir/CodeSystem/x")
+    assert resp.headers["ratelimit-remaining"] == "0"
+    assert int(resp.headers["retry-after"]) >= 1
+    assert "ratelimit-limit" not in client.get("/healthz").headers
+    assert route_class("/fhir/ValueSet/$expand") == "autocomplete"
+    assert route_class("/fhir/Bundle") == "translate"
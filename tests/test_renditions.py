@@ -0,0 +1,23 @@
+import gzip
+
+import orjson
+
+from app.services.renditions import pick_encoding, render
+
+
+def test_render_variants_round_trip():
+    content = {"resourceType": "CodeSystem", "concept": [{"code": "A"}] * 50}
+    bodies = render(content)
+    assert orjson.loads(bodies["identity"]) == content
+    assert gzip.decompress(bodies["gzip"]) == bodies["identity"]
+    assert len(bodies["gzip"]) < len(bodies["identity"])
+
+
+def test_pick_encoding_honours_q_values():
+    available = {"identity": b"", "gzip": b"", "br": b""}
+    assert pick_encoding(None, available) == "identity"
+    assert pick_encoding("gzip, deflate", available) == "gzip"
+    assert pick_encoding("gzip;q=0.5, br", available) == "br"
+    assert pick_encoding("br;q=0, gzip;q=0.1", available) == "gzip"
+    assert pick_encoding("br", {"identity": b"", "gzip": b""}) == "identity"
+    assert pick_encoding("*", available) == "br"
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+
+from app import security
+from app.config import get_settings
+from app.services.cache import LRUCache
+from app.services.jwks import JWKSCache
+
+
+def claims() -> dict:
+    settings = get_settings()
+    return {
+        "sub": "user-1",
+        "aud": settings.oauth2_audience,
+        "iss": settings.oauth2_issuer,
+        "exp": int(time.time()) + 60,
+    }
+
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch):
+    calls = []
+    verify = security._verify
+    monkeypatch.setattr(security, "_verify", lambda t: calls.append(t) or verify(t))
+    token = security.create_access_token("user-1")
+    assert security.decode_token(token)["sub"] == "user-1"
+    assert security.decode_token(token)["sub"] == "user-1"
+    assert len(calls) == 1
+    with pytest.raises(HTTPException):
+        security.decode_token(token + "x")
+
+
+def test_rs256_tokens_verify_against_jwks(monkeypatch):
+    pem = (
+        rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        .private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        .decode()
+    )
+    public = jwk.construct(pem, "RS256").public_key().to_dict()
+    keys = JWKSCache("https://issuer.example/jwks")
+    keys.keys = {"k1": {**public, "kid": "k1"}}
+    monkeypatch.setattr(security, "jwks", keys)
+    monkeypatch.setattr(security, "token_cache", LRUCache())
+
+    token = jwt.encode(claims(), pem, algorithm="RS256", headers={"kid": "k1"})
+    assert security.decode_token(token)["sub"] == "user-1"
+    stranger = jwt.encode(claims(), pem, algorithm="RS256", headers={"kid": "k2"})
+    with pytest.raises(HTTPException):
+        security.decode_token(stranger)
+    # The issuer's HS256 secret is no longer accepted
+    with pytest.raises(HTTPException):
+        security.decode_token(security.create_access_token("user-1"))
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.services.singleflight import SingleFlight
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"code": "1F40.Z"}
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*[flight.do("k", fetch) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(r == {"code": "1F40.Z"} for r in results)
+
+
+def test_waits_for_other_worker_via_redis_lock():
+    redis = FakeRedis()
+    redis.data["lock:k"] = "other-worker"
+    cache = {}
+
+    async def fetch():
+        raise AssertionError("should have used the other worker's result")
+
+    async def cache_get(key):
+        return cache.get(key)
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.02)
+        cache["k"] = {"code": "1F40.Z"}
+
+    async def main():
+        flight = SingleFlight(redis, poll_seconds=0.005, wait_seconds=1)
+        result, _ = await asyncio.gather(
+            flight.do("k", fetch, cache_get=cache_get), other_worker_finishes()
+        )
+        return result
+
+    assert asyncio.run(main()) == {"code": "1F40.Z"}
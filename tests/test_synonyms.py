@@ -0,0 +1,31 @@
+from openpyxl import Workbook
+
+from app.services.ingest import load_synonym_table, merge_synonyms
+from app.services.synonyms import SynonymDictionary, compile_synonym_groups
+
+
+def test_sat_table_compiles_to_expandable_groups(tmp_path):
+    path = tmp_path / "ayu-sat-table-i.xlsx"
+    wb = Workbook()
+    for row in [
+        ["Sr No.", "Code", "Word", "Short Defination"],
+        [1, "SAT-I", "cikitsA", "treatment"],
+        [2, "SAT-I.3", "cikitsA", "disease management/ treatment"],
+        [3, "SAT-I.4", "jvaraH/ santApaH", ""],
+        [4, "SAT-I.5", "kAyaH", "digestive/metabolic factors of the whole body"],
+    ]:
+        wb.active.append(row)
+    wb.save(path)
+
+    syn_map = merge_synonyms({}, load_synonym_table(path))
+    assert syn_map == {
+        "cikitsa": ["treatment", "disease management"],
+        "jvarah": ["santApaH"],
+    }
+
+    synonyms = SynonymDictionary()
+    synonyms.build(compile_synonym_groups(syn_map))
+    assert synonyms.expand("Treatment") == ["cikitsa", "disease management"]
+    assert synonyms.expand("cikitsA", limit=1) == ["treatment"]
+    assert synonyms.expand("santapah") == ["jvarah"]
+    assert synonyms.expand("kayah") == []
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.db.models import Mapping
+from app.fhir import endpoints
+
+
+NAM = "https://namaste.ayush.gov.in/fhir/CodeSystem/ayurveda"
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self.rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeDB:
+    def __init__(self, mappings: list[Mapping], displays: dict):
+        self.mappings = mappings
+        self.displays = displays
+        self.tables: list[str] = []
+
+    async def execute(self, stmt):
+        table = stmt.get_final_froms()[0].name
+        self.tables.append(table)
+        if table == "mappings":
+            return FakeResult(self.mappings)
+        return FakeResult([(s, c, d) for (s, c), d in self.displays.items()])
+
+
+@pytest.fixture
+def autocode(monkeypatch):
+    calls = {"active": 0, "peak": 0, "texts": []}
+
+    async def fake_autocode(text, release_id=None, raise_errors=False):
+        calls["active"] += 1
+        calls["peak"] = max(calls["peak"], calls["active"])
+        calls["texts"].append(text)
+        await asyncio.sleep(0.01)
+        calls["active"] -= 1
+        return {"theCode": f"X-{text}"}, endpoints.ICD11_MMS
+
+    async def no_mirror(db, terms, release_id=None):
+        list(terms)
+        return {}
+
+    async def no_refresh(db, force=False):
+        return None
+
+    monkeypatch.setattr(endpoints, "autocode_best_effort", fake_autocode)
+    monkeypatch.setattr(endpoints, "mirror_title_matches", no_mirror)
+    monkeypatch.setattr(endpoints.synonym_dictionary, "refresh", no_refresh)
+    return calls
+
+
+def mapped(code: str) -> Mapping:
+    return Mapping(
+        source_system=NAM,
+        source_code=code,
+        target_system=endpoints.ICD11_TM2,
+        target_code=f"T-{code}",
+        equivalence="equivalent",
+    )
+
+
+def target(params: list[dict]) -> str | None:
+    for p in params:
+        if p["name"] == "match":
+            return p["part"][1]["valueCoding"]["code"]
+    return None
+
+
+def test_batch_resolves_mappings_in_one_query_and_keeps_order(monkeypatch, autocode):
+    monkeypatch.setattr(get_settings(), "translate_concurrency", 2)
+    pairs = [(NAM, c) for c in ("u1", "m1", "u2", "u3", "m1", "u4")]
+    db = FakeDB(
+        [mapped("m1")],
+        {(NAM, c): f"disp {c}" for c in ("u1", "u2", "u3", "u4")},
+    )
+    results = asyncio.run(endpoints.translate_codes(db, pairs))
+
+    assert db.tables == ["mappings", "concepts"]
+    assert [target(r) for r in results] == [
+        "X-disp u1",
+        "T-m1",
+        "X-disp u2",
+        "X-disp u3",
+        "T-m1",
+        "X-disp u4",
+    ]
+    # Duplicates share one fallback, and at most two run at once
+    assert sorted(autocode["texts"]) == ["disp u1", "disp u2", "disp u3", "disp u4"]
+    assert autocode["peak"] == 2
+
+
+def translate(parameter: list[dict], db: FakeDB) -> dict:
+    body = {"resourceType": "Parameters", "parameter": parameter}
+    return asyncio.run(endpoints.conceptmap_translate(body, None, db))
+
+
+def test_batch_form_always_answers_with_translation_groups(autocode):
+    db = FakeDB([mapped("m1")], {})
+    url = {"name": "url", "valueUri": "http://example.org/cm"}
+    flat = translate(
+        [url, {"name": "system", "valueUri": NAM}, {"name": "code", "valueCode": "m1"}],
+        db,
+    )
+    assert flat["parameter"][0] == {"name": "result", "valueBoolean": True}
+
+    coding = {"name": "coding", "valueCoding": {"system": NAM, "code": "m1"}}
+    grouped = translate([url, coding], db)
+    (group,) = grouped["parameter"]
+    assert group["name"] == "translation"
+    assert group["part"][:2] == [
+        {"name": "system", "valueUri": NAM},
+        {"name": "code", "valueCode": "m1"},
+    ]
+
+
+def test_batch_size_is_limited(monkeypatch, autocode):
+    monkeypatch.setattr(get_settings(), "translate_batch_max_codes", 2)
+    parameter = [
+        {"name": "url", "valueUri": "http://example.org/cm"},
+        {"name": "system", "valueUri": NAM},
+        *({"name": "code", "valueCode": c} for c in ("a", "b", "c")),
+    ]
+    with pytest.raises(HTTPException) as exc:
+        translate(parameter, FakeDB([], {}))
+    assert exc.value.status_code == 400